@@ -0,0 +1,146 @@
+"""
+Fetch once, fan out to several Drafters accounts.
+
+The Drafters board and the Odds API are scraped once per cycle and the
+combined frame is shared in memory. Each account in accounts.json then marks
+its own plays, builds slips and submits them in its own thread, with its own
+threshold, exposure caps, entry fee and submission history. Odds API spend and scrape time do not grow with the
+number of accounts.
+
+accounts.json is a list of accounts, e.g.
+    [{"name": "main", "auth_token_env": "DRAFTERS_AUTH_TOKEN", "threshold": 0.56},
+     {"name": "alt", "auth_token_env": "DRAFTERS_AUTH_TOKEN_ALT", "display_name": "alt_user",
+      "entry_fee": 5, "max_player_exposure": "0.3", "dry_run": true}]
+Profile fields (display_name, public_ip, country_name, state_name, user_dob)
+default to the .env values. Tokens are read from the variable named by
+auth_token_env so they stay out of the file.
+
+The account using the .env token (DRAFTERS_AUTH_TOKEN) keeps the submission
+history and exposure counters of single-account runs, so switching to
+--accounts never resubmits its slips; other accounts keep theirs under
+data/accounts/<name>/. history_file and exposure_file override either.
+"""
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functions_libraries import load_config, build_drafters_headers, entry_fee_drafters
+from drafters_poster import (PLAY_THRESHOLD, SUBMITTED_COMBINATIONS_FILE, start_run, prepare_combined_data,
+                             mark_plays, build_and_submit_slips, resolve_exposure_limits)
+from exposure import EXPOSURE_FILE
+from profiling import write_summary
+
+ACCOUNTS_FILE = 'accounts.json'
+ACCOUNTS_DIR = 'data/accounts'
+
+PROFILE_FIELDS = ['display_name', 'public_ip', 'country_name', 'state_name', 'user_dob']
+
+def load_accounts(path=ACCOUNTS_FILE):
+    """Read and validate the account list; raises ValueError on a bad entry"""
+    with open(path) as f:
+        entries = json.load(f)
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{path} must contain a non-empty list of accounts")
+
+    default_profile = load_config()['user_config']
+    env_token = load_config()['authorization_token']
+    accounts = []
+    for entry in entries:
+        name = entry.get('name')
+        if not name or not re.fullmatch(r'[\w.-]+', name):
+            raise ValueError(f"Every account needs a name made of letters, digits, '_', '-' or '.': {name!r}")
+        if any(account['name'] == name for account in accounts):
+            raise ValueError(f"Duplicate account name: {name}")
+
+        token = os.getenv(entry['auth_token_env']) if 'auth_token_env' in entry else entry.get('auth_token')
+        if not token:
+            raise ValueError(f"No Drafters auth token for account {name} (set auth_token_env)")
+        if any(account['headers']['Authorization'] == token for account in accounts):
+            raise ValueError(f"Account {name} uses the same auth token as another account")
+
+        if token == env_token:
+            # Same Drafters account as single-account runs: share their history and counters
+            default_history, default_exposure = SUBMITTED_COMBINATIONS_FILE, EXPOSURE_FILE
+        else:
+            account_dir = os.path.join(ACCOUNTS_DIR, name)
+            default_history = os.path.join(account_dir, 'submitted_combinations.txt')
+            default_exposure = os.path.join(account_dir, 'exposure_counts.json')
+        accounts.append({
+            'name': name,
+            'headers': build_drafters_headers(token),
+            'user_config': {field: entry.get(field, default_profile[field]) for field in PROFILE_FIELDS},
+            'threshold': float(entry.get('threshold', PLAY_THRESHOLD)),
+            'entry_fee': entry.get('entry_fee', entry_fee_drafters),
+            'exposure_limits': {kind: entry.get(f'max_{kind}_exposure') for kind in ['player', 'game', 'prop']},
+            'dry_run': bool(entry.get('dry_run', False)),
+            'history_file': entry.get('history_file', default_history),
+            'exposure_file': entry.get('exposure_file', default_exposure)
+        })
+    for kind in ['history_file', 'exposure_file']:
+        paths = [os.path.abspath(account[kind]) for account in accounts]
+        if len(set(paths)) != len(paths):
+            raise ValueError(f"Two accounts share the same {kind}")
+    return accounts
+
+def run_account(account, combined_df, dry_run=False, offline=False, max_quote_age=None, dedup_priority='main'):
+    """Mark plays at the account's threshold, build its slips and submit them"""
+    name = account['name']
+    dry_run = dry_run or account['dry_run']
+    os.makedirs(os.path.dirname(account['history_file']) or '.', exist_ok=True)
+
+    account_df = mark_plays(combined_df.copy(), account['threshold'])
+    print(f"[{name}] {(account_df['play'] == 'PLAY').sum()} plays at threshold {account['threshold']}")
+    try:
+        result = build_and_submit_slips(account_df, account['user_config'],
+                                        resolve_exposure_limits(account['exposure_limits']),
+                                        threshold=account['threshold'], dry_run=dry_run, offline=offline,
+                                        max_quote_age=max_quote_age, dedup_priority=dedup_priority,
+                                        headers=account['headers'], entry_fee=account['entry_fee'],
+                                        history_file=account['history_file'],
+                                        exposure_file=account['exposure_file'],
+                                        cache_name=f'combinations_{name}', profile_stages=False)
+    except SystemExit:
+        # A rejected submission stops this account only
+        print(f"[{name}] Stopped after a failed submission")
+        return None
+
+    if dry_run:
+        print(f"[{name}] Dry run: built {len(result)} slips, nothing submitted")
+    else:
+        print(f"[{name}] Submitted {len(result)} slips")
+    return result
+
+def run_accounts(accounts, league_ids=None, dry_run=False, workers=None, offline=False, profile=False,
+                 use_cache=True, max_quote_age=None, dedup_priority=None):
+    """
+    Scrape once and run every account on the shared frame concurrently.
+    Only the shared stages are profiled. Returns {account name: submission
+    results (None if the account stopped)}.
+    """
+    dry_run, max_quote_age, dedup_priority = start_run(dry_run, offline=offline, profile=profile,
+                                                       use_cache=use_cache, max_quote_age=max_quote_age,
+                                                       dedup_priority=dedup_priority)
+
+    # The saved combined CSV and archive use the lowest threshold so they hold every account's plays
+    combined_df = prepare_combined_data(league_ids, workers=workers, offline=offline,
+                                        threshold=min(account['threshold'] for account in accounts),
+                                        dedup_priority=dedup_priority)
+    write_summary()
+    if combined_df is None:
+        return None
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(accounts)) as executor:
+        futures = {
+            account['name']: executor.submit(run_account, account, combined_df, dry_run=dry_run,
+                                             offline=offline, max_quote_age=max_quote_age,
+                                             dedup_priority=dedup_priority)
+            for account in accounts
+        }
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print(f"[{name}] Failed: {e}")
+                results[name] = None
+    return results
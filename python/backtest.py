@@ -0,0 +1,162 @@
+"""
+Vectorized threshold and strategy backtester.
+
+Loads the archived combined_props_data snapshots (data/archive/, gzipped and
+kept for ARCHIVE_RETENTION_DAYS) and graded
+outcomes (a CSV with prop_id and actual stat value), then evaluates every
+combination of play threshold, devig method, book routing and slip size in a
+single NumPy pass over a (thresholds x strategies x props) array.
+
+Slip results assume legs hit independently at the strategy's observed hit
+rate and use the payout multipliers passed in (defaults in SLIP_PAYOUTS).
+"""
+import glob
+import os
+import numpy as np
+import pandas as pd
+from functions_libraries import COLLEGE_SPORT_KEYS
+
+ARCHIVE_DIR = 'data/archive'
+ARCHIVE_PATTERN = 'combined_props_data_*.csv*'
+
+# Archived snapshots older than this are deleted when a new one is written
+ARCHIVE_RETENTION_DAYS = 30
+OUTCOMES_FILE = 'data/outcomes.csv'
+
+DEVIG_METHODS = ['multiplicative', 'additive', 'power']
+
+# 'routed' is the live behaviour: betonlineag for college sports, pinnacle otherwise
+BOOK_ROUTINGS = ['routed', 'pinnacle', 'betonlineag']
+
+# Total return per unit staked for a winning slip of each size; set these to the current Drafters payouts
+SLIP_PAYOUTS = {3: 5.0, 5: 10.0, 7: 25.0}
+
+def archive_combined_data(combined_df, retention_days=ARCHIVE_RETENTION_DAYS):
+    """Keep a compressed, timestamped copy of a run's combined props data for backtesting"""
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(ARCHIVE_DIR, f"combined_props_data_{pd.Timestamp.now(tz='UTC'):%Y%m%d-%H%M%S}.csv.gz")
+    combined_df.to_csv(path, index=False)
+    prune_archive(retention_days)
+    return path
+
+def prune_archive(retention_days=ARCHIVE_RETENTION_DAYS):
+    """Delete archived snapshots older than retention_days"""
+    cutoff = pd.Timestamp.now().timestamp() - retention_days * 86400
+    for path in glob.glob(os.path.join(ARCHIVE_DIR, ARCHIVE_PATTERN)):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def load_archived_props(archive_dir=ARCHIVE_DIR, outcomes_file=OUTCOMES_FILE, latest_only=True):
+    """
+    Load archived snapshots joined to graded outcomes. With latest_only each prop
+    keeps only its last snapshot, i.e. the quote closest to lock.
+    """
+    paths = sorted(glob.glob(os.path.join(archive_dir, ARCHIVE_PATTERN)))
+    if not paths:
+        raise FileNotFoundError(f"No archived snapshots found in {archive_dir}")
+
+    snapshots = []
+    for snapshot_id, path in enumerate(paths):
+        df = pd.read_csv(path)
+        df['snapshot_id'] = snapshot_id
+        snapshots.append(df)
+    props = pd.concat(snapshots, ignore_index=True)
+    if latest_only:
+        props = props.drop_duplicates(subset='prop_id', keep='last')
+
+    outcomes = pd.read_csv(outcomes_file)[['prop_id', 'actual']]
+    props = pd.merge(props, outcomes, on='prop_id', how='inner')
+    print(f"Loaded {len(props)} graded props from {len(paths)} snapshots")
+    return props.reset_index(drop=True)
+
+def devig_probabilities(over_prices, under_prices, method):
+    """No-vig over probability for arrays of decimal prices"""
+    over_implied = 1 / over_prices
+    under_implied = 1 / under_prices
+    if method == 'multiplicative':
+        return over_implied / (over_implied + under_implied)
+    if method == 'additive':
+        return over_implied - (over_implied + under_implied - 1) / 2
+    if method == 'power':
+        # Solve over^k + under^k = 1 for k with a few Newton steps
+        k = np.ones_like(over_implied)
+        log_over = np.log(over_implied)
+        log_under = np.log(under_implied)
+        for _ in range(20):
+            f = over_implied ** k + under_implied ** k - 1
+            df = over_implied ** k * log_over + under_implied ** k * log_under
+            k = k - f / df
+        return over_implied ** k
+    raise ValueError(f"Unknown devig method: {method}")
+
+def get_book_prices(props, book, side):
+    """A book's prices of one side, NaN where the book quotes a different line than Drafters"""
+    prices = props[f'{book}_{side}_price'].to_numpy(dtype=float)
+    same_line = props[f'{book}_line'].to_numpy(dtype=float) == props['bid_stats_value'].to_numpy(dtype=float)
+    return np.where(same_line, prices, np.nan)
+
+def get_routed_prices(props, routing, side):
+    """Prices of one side for every prop under a book routing"""
+    pinnacle = get_book_prices(props, 'pinnacle', side)
+    betonline = get_book_prices(props, 'betonlineag', side)
+    if routing == 'pinnacle':
+        return pinnacle
+    if routing == 'betonlineag':
+        return betonline
+    return np.where(props['sport'].isin(COLLEGE_SPORT_KEYS).to_numpy(), betonline, pinnacle)
+
+def run_backtest(props, thresholds, methods=DEVIG_METHODS, routings=BOOK_ROUTINGS,
+                 slip_sizes=(3, 5, 7), slip_payouts=SLIP_PAYOUTS):
+    """Evaluate the full parameter grid and return one row per configuration"""
+    thresholds = np.asarray(thresholds, dtype=float)
+    slip_sizes = np.asarray(slip_sizes)
+    strategies = [(routing, method) for routing in routings for method in methods]
+
+    # (strategies x props) no-vig over probabilities
+    p_over = np.vstack([
+        devig_probabilities(get_routed_prices(props, routing, 'over'),
+                            get_routed_prices(props, routing, 'under'), method)
+        for routing, method in strategies
+    ])
+    p_under = 1 - p_over
+    p_best = np.maximum(p_over, p_under)
+    picks_over = p_over > p_under
+
+    line = props['bid_stats_value'].to_numpy(dtype=float)
+    actual = props['actual'].to_numpy(dtype=float)
+    # (strategies x props): pushes and props without prices are not graded
+    graded = ((actual != line) & ~np.isnan(actual))[None, :] & ~np.isnan(p_over)
+    hit = np.where(picks_over, actual > line, actual < line) & graded
+
+    # (thresholds x strategies x props) play mask
+    plays = (p_best[None, :, :] > thresholds[:, None, None]) & graded[None, :, :]
+    n_plays = plays.sum(axis=2)
+    n_hits = (plays & hit[None, :, :]).sum(axis=2)
+    predicted = np.where(plays, p_best[None, :, :], 0).sum(axis=2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        hit_rate = n_hits / n_plays
+        mean_predicted = predicted / n_plays
+
+    # (thresholds x strategies x slip sizes) slip economics
+    payouts = np.array([slip_payouts[size] for size in slip_sizes], dtype=float)
+    slip_win_rate = hit_rate[:, :, None] ** slip_sizes[None, None, :]
+    slip_roi = slip_win_rate * payouts[None, None, :] - 1
+
+    t_idx, s_idx, k_idx = np.meshgrid(np.arange(len(thresholds)), np.arange(len(strategies)),
+                                      np.arange(len(slip_sizes)), indexing='ij')
+    t_idx, s_idx, k_idx = t_idx.ravel(), s_idx.ravel(), k_idx.ravel()
+    return pd.DataFrame({
+        'threshold': thresholds[t_idx],
+        'book_routing': [strategies[i][0] for i in s_idx],
+        'devig_method': [strategies[i][1] for i in s_idx],
+        'slip_size': slip_sizes[k_idx],
+        'plays': n_plays[t_idx, s_idx],
+        'hits': n_hits[t_idx, s_idx],
+        'hit_rate': hit_rate[t_idx, s_idx],
+        'mean_predicted': mean_predicted[t_idx, s_idx],
+        'slip_win_rate': slip_win_rate.ravel(),
+        'slip_roi': slip_roi.ravel()
+    }).sort_values('slip_roi', ascending=False, ignore_index=True)
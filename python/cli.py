@@ -0,0 +1,238 @@
+"""
+Command line entry point.
+
+Heavy modules (pandas, requests, the scrapers) are only imported inside the
+subcommands that need them, so `leagues` and `check` start almost instantly.
+
+Examples:
+    python cli.py leagues --sports NFL,NBA
+    python cli.py check
+    python cli.py run --sports NHL,NBA --dry-run
+    python cli.py run --offline --profile
+    python cli.py run --all --accounts accounts.json
+    python cli.py serve
+"""
+import argparse
+import os
+import sys
+from functions_libraries import SPORT_LEAGUES, REQUIRED_ENV_VARS, get_sport_selections
+
+def parse_sports(value):
+    """Parse a comma separated list of sports, e.g. 'NFL,NBA'"""
+    return [sport.strip() for sport in value.split(',') if sport.strip()]
+
+def resolve_league_ids(args):
+    """Turn --sports / --all into league ids without prompting (falls back to the prompt)"""
+    if getattr(args, 'all', False):
+        return list(SPORT_LEAGUES.values())
+    return get_sport_selections(args.sports)
+
+def cmd_leagues(args):
+    """List the selected leagues and their Drafters league ids"""
+    for sport, league_id in zip(args.sports, args.league_ids):
+        print(f"{sport.upper()}\t{league_id}")
+    return 0
+
+def cmd_check(args):
+    """Check that the environment is configured without touching the network"""
+    from functions_libraries import load_config
+    load_config()
+    missing = [name for name in REQUIRED_ENV_VARS if not os.getenv(name)]
+    if missing:
+        print(f"Missing environment variables: {', '.join(missing)}")
+        return 1
+    print("Configuration OK")
+    return 0
+
+def cmd_drafters(args):
+    """Scrape the Drafters board for the selected leagues"""
+    from drafters_scraper import fetch_props_games
+    fetch_props_games(args.league_ids)
+    return 0
+
+def cmd_odds(args):
+    """Scrape the Odds API for the selected leagues"""
+    from sports_main import process_all_sports
+    from stage_cache import set_cache_enabled
+    set_cache_enabled(not args.no_cache)
+    process_all_sports(args.league_ids, workers=args.workers)
+    return 0
+
+def cmd_run(args):
+    """Run the full scrape, compare and submit pipeline"""
+    if args.accounts:
+        from accounts import load_accounts, run_accounts
+        try:
+            accounts = load_accounts(args.accounts)
+        except (OSError, ValueError) as e:
+            print(f"Error: could not load accounts from {args.accounts}: {e}", file=sys.stderr)
+            return 2
+        run_accounts(accounts, args.league_ids, dry_run=args.dry_run, workers=args.workers,
+                     offline=args.offline, profile=args.profile, use_cache=not args.no_cache,
+                     max_quote_age=args.max_quote_age, dedup_priority=args.dedup_priority)
+        return 0
+
+    from drafters_poster import run_pipeline
+    run_pipeline(args.league_ids, dry_run=args.dry_run, workers=args.workers,
+                 offline=args.offline, profile=args.profile, use_cache=not args.no_cache,
+                 threshold=args.threshold, max_quote_age=args.max_quote_age,
+                 exposure_limits={'player': args.max_player_exposure, 'game': args.max_game_exposure,
+                                  'prop': args.max_prop_exposure},
+                 dedup_priority=args.dedup_priority)
+    return 0
+
+def cmd_history(args):
+    """Query the stored line movement history"""
+    import pandas as pd
+    from line_history import get_line_movement, get_price_moves
+    if args.player:
+        if not args.market:
+            print("Error: --market is required with --player", file=sys.stderr)
+            return 2
+        df = get_line_movement(args.player, args.market, hours=args.hours, book=args.book, source=args.source)
+    else:
+        df = get_price_moves(args.cents, book=args.book, source=args.source, hours=args.hours)
+    with pd.option_context('display.max_rows', None, 'display.width', None):
+        print(df if not df.empty else "No matching history")
+    return 0
+
+def parse_range(value):
+    """Parse 'start:stop:step' (inclusive) or a comma separated list of floats"""
+    if ':' in value:
+        start, stop, step = (float(part) for part in value.split(':'))
+        count = int(round((stop - start) / step)) + 1
+        return [round(start + i * step, 10) for i in range(count)]
+    return [float(part) for part in value.split(',')]
+
+def cmd_backtest(args):
+    """Sweep thresholds, devig methods, book routings and slip sizes over archived runs"""
+    import pandas as pd
+    from backtest import load_archived_props, run_backtest, SLIP_PAYOUTS
+    unknown_sizes = [size for size in args.sizes if size not in SLIP_PAYOUTS]
+    if unknown_sizes:
+        print(f"Error: no payout for slip size {', '.join(map(str, unknown_sizes))}; "
+              f"add it to SLIP_PAYOUTS in backtest.py (known sizes: {', '.join(map(str, SLIP_PAYOUTS))})",
+              file=sys.stderr)
+        return 2
+    props = load_archived_props(outcomes_file=args.outcomes, latest_only=not args.all_snapshots)
+    results = run_backtest(props, args.thresholds, methods=args.methods, routings=args.routings,
+                           slip_sizes=args.sizes)
+    results.to_csv(args.output, index=False)
+    with pd.option_context('display.max_rows', None, 'display.width', None):
+        print(results[results['plays'] >= args.min_plays].head(args.top))
+    print(f"Evaluated {len(results)} configurations, full results saved to {args.output}")
+    return 0
+
+def cmd_serve(args):
+    """Serve the latest edges from an in-memory index over local HTTP/JSON"""
+    from edge_server import serve
+    serve(args.file, host=args.host, port=args.port, poll_interval=args.poll)
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Drafters prop scraper and auto-poster")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_selection_args(subparser):
+        group = subparser.add_mutually_exclusive_group()
+        group.add_argument('--sports', type=parse_sports,
+                           help=f"Comma separated sports ({','.join(SPORT_LEAGUES)})")
+        group.add_argument('--all', action='store_true', help="Select every sport")
+
+    leagues = subparsers.add_parser('leagues', help=cmd_leagues.__doc__)
+    leagues.add_argument('--sports', type=parse_sports,
+                         help=f"Comma separated sports ({','.join(SPORT_LEAGUES)})")
+    leagues.set_defaults(func=cmd_leagues)
+
+    check = subparsers.add_parser('check', help=cmd_check.__doc__)
+    check.set_defaults(func=cmd_check)
+
+    drafters = subparsers.add_parser('drafters', help=cmd_drafters.__doc__)
+    add_selection_args(drafters)
+    drafters.set_defaults(func=cmd_drafters)
+
+    for name, func in [('odds', cmd_odds), ('run', cmd_run)]:
+        subparser = subparsers.add_parser(name, help=func.__doc__)
+        add_selection_args(subparser)
+        subparser.add_argument('--workers', type=int, default=None,
+                               help="Worker processes for fetching events (default: SHARD_WORKERS)")
+        subparser.add_argument('--no-cache', action='store_true',
+                               help="Recompute every stage even if its inputs are unchanged")
+        subparser.set_defaults(func=func)
+    run = subparsers.choices['run']
+    run.add_argument('--dry-run', action='store_true',
+                     help="Compute plays and slips but do not submit any entries")
+    run.add_argument('--offline', action='store_true',
+                     help="Replay the data saved by the previous run instead of scraping (implies --dry-run)")
+    run.add_argument('--profile', action='store_true',
+                     help="Profile each stage and write the results to data/profiles/ (implies --no-cache)")
+    run.add_argument('--threshold', type=float, default=0.55,
+                     help="Minimum no-vig probability for a play (default 0.55)")
+    run.add_argument('--max-quote-age', type=float, default=None,
+                     help="Revalidate legs whose odds are older than this many seconds before submitting "
+                          "(default QUOTE_MAX_AGE_SECONDS, negative disables)")
+    run.add_argument('--dedup-priority', choices=['main', 'vig'], default=None,
+                     help="Keep the main market or the tighter vig when standard and alternate "
+                          "markets quote the same line (default DEDUP_PRIORITY or main)")
+    for kind in ['player', 'game', 'prop']:
+        run.add_argument(f'--max-{kind}-exposure', default=None,
+                         help=f"Cap slips per {kind}: a count (5) or a fraction of slips (0.25) "
+                              f"(default MAX_{kind.upper()}_EXPOSURE)")
+    run.add_argument('--accounts', metavar='FILE', default=None,
+                     help="Scrape once and submit for every account in this JSON file concurrently; "
+                          "threshold and exposure caps come from the file")
+
+    backtest = subparsers.add_parser('backtest', help=cmd_backtest.__doc__)
+    backtest.add_argument('--outcomes', default='data/outcomes.csv',
+                          help="CSV of graded props with prop_id and actual columns")
+    backtest.add_argument('--thresholds', type=parse_range, default=parse_range('0.50:0.65:0.005'),
+                          help="start:stop:step or comma separated list (default 0.50:0.65:0.005)")
+    backtest.add_argument('--methods', type=parse_sports, default=['multiplicative', 'additive', 'power'],
+                          help="Comma separated devig methods")
+    backtest.add_argument('--routings', type=parse_sports, default=['routed', 'pinnacle', 'betonlineag'],
+                          help="Comma separated book routings")
+    backtest.add_argument('--sizes', type=lambda value: [int(size) for size in value.split(',')], default=[3, 5, 7],
+                          help="Comma separated slip sizes")
+    backtest.add_argument('--all-snapshots', action='store_true',
+                          help="Score every archived snapshot of a prop instead of only the last one")
+    backtest.add_argument('--top', type=int, default=20, help="Number of configurations to print")
+    backtest.add_argument('--min-plays', type=int, default=30,
+                          help="Only print configurations with at least this many graded plays")
+    backtest.add_argument('--output', default='data/backtest_results.csv')
+    backtest.set_defaults(func=cmd_backtest)
+
+    serve = subparsers.add_parser('serve', help=cmd_serve.__doc__)
+    serve.add_argument('--file', default='data/combined_props_data.csv', help="Combined props CSV to index")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--poll', type=float, default=2, help="Seconds between checks for a new run")
+    serve.set_defaults(func=cmd_serve)
+
+    history = subparsers.add_parser('history', help=cmd_history.__doc__)
+    history.add_argument('--player', help="Show line movement for this player (requires --market)")
+    history.add_argument('--market', help="Market key, e.g. player_points")
+    history.add_argument('--hours', type=float, default=6, help="Look back this many hours (default 6)")
+    history.add_argument('--cents', type=float, default=5,
+                         help="Without --player: list props whose price moved more than this since their previous quote")
+    history.add_argument('--book', help="Restrict to one book, e.g. pinnacle")
+    history.add_argument('--source', choices=['odds', 'drafters'], default='odds')
+    history.set_defaults(func=cmd_history)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, 'offline', False):
+        args.league_ids = None
+    elif hasattr(args, 'sports'):
+        if args.command == 'leagues' and args.sports is None:
+            args.sports = list(SPORT_LEAGUES)
+        try:
+            args.league_ids = resolve_league_ids(args)
+        except (ValueError, RuntimeError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
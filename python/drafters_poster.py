@@ -1,19 +1,50 @@
 import pandas as pd
 from drafters_scraper import fetch_props_games
-from sports_main import process_all_sports
-from functions_libraries import entry_fee_drafters, headers_drafters, user_config
+from sports_main import process_all_sports, dedupe_odds_rows
+from functions_libraries import entry_fee_drafters, load_config, devig_odds, COLLEGE_SPORT_KEYS
+from profiling import enable_profiling, profile_stage, write_summary
+from stage_cache import cached_stage, set_cache_enabled
+from http_client import request as http_request
+from revalidation import revalidate_slip
+from backtest import archive_combined_data
+from exposure import ExposureTracker, parse_limit, EXPOSURE_FILE
+from scheduling import schedule_slips, drop_locking_plays, is_locking
 import requests
+from contextlib import nullcontext
 from itertools import combinations
-from time import sleep
+from time import sleep, time
+import os
 import random
 import sys
+import tempfile
 
-def combine_drafters_and_odds_data():
+# Minimum no-vig probability on either side for a prop to be played
+PLAY_THRESHOLD = 0.55
 
-    drafters_df = fetch_props_games()
-    league_ids = drafters_df['game_id'].unique().tolist()
-    odds_df = process_all_sports(league_ids)  
-    
+SUBMITTED_COMBINATIONS_FILE = 'data/submitted_combinations.txt'
+COMBINED_DATA_FILE = 'data/combined_props_data.csv'
+
+def save_csv_atomic(df, path):
+    """Write through a temporary file so readers such as the edge server never see a partial CSV"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w', newline='') as f:
+        df.to_csv(f, index=False)
+    os.replace(tmp_path, path)
+
+def load_saved_data():
+    """Load the Drafters and odds data saved by the previous run (for offline runs)"""
+    drafters_df = pd.read_csv('drafters_data.csv')
+    odds_df = pd.read_csv('data/all_sports_data.csv')
+    print(f"Loaded {len(drafters_df)} saved Drafters props and {len(odds_df)} saved odds rows")
+    return drafters_df, odds_df
+
+def merge_drafters_and_odds(drafters_df, odds_df, dedup_priority='main'):
+    """
+    Join the Drafters board to the odds on player, market and line.
+    Duplicate standard/alternate odds rows are removed first (see dedupe_odds_rows).
+    """
     if odds_df is None or drafters_df.empty:
         print("No data available from one or both sources")
         return None
@@ -36,7 +67,7 @@ def combine_drafters_and_odds_data():
     # Merge game_ids 7,10 data with betonlineag_line
     merged_game7_10 = pd.merge(
         drafters_game7_10,
-        odds_df,
+        dedupe_odds_rows(odds_df, 'betonlineag', dedup_priority),
         left_on=['player_name', 'bid_stats_name', 'bid_stats_value'],
         right_on=['player_name', 'market_key', 'betonlineag_line'],
         how='inner',
@@ -46,7 +77,7 @@ def combine_drafters_and_odds_data():
     # Merge other games data with pinnacle_line
     merged_other = pd.merge(
         drafters_other,
-        odds_df,
+        dedupe_odds_rows(odds_df, 'pinnacle', dedup_priority),
         left_on=['player_name', 'bid_stats_name', 'bid_stats_value'],
         right_on=['player_name', 'market_key', 'pinnacle_line'],
         how='inner',
@@ -54,35 +85,18 @@ def combine_drafters_and_odds_data():
     )
 
     # Combine the results
-    combined_df = pd.concat([merged_game7_10, merged_other], ignore_index=True)
-
-    # Save the combined data
-    combined_df.to_csv('data/combined_props_data.csv', index=False)
-    return combined_df
-
-def calculate_no_vig_probabilities(df):
-    # Function to convert decimal odds to probabilities and remove vig
-    def devig_odds(over_decimal, under_decimal):
-        over_prob = 1 / over_decimal
-        under_prob = 1 / under_decimal
-        total_prob = over_prob + under_prob
-        
-        # Normalize probabilities to remove vig
-        no_vig_over = over_prob / total_prob
-        no_vig_under = under_prob / total_prob
-        
-        return no_vig_over, no_vig_under
+    return pd.concat([merged_game7_10, merged_other], ignore_index=True)
 
-    # Create masks for basketball_ncaab and americanfootball_ncaaf
-    ncaab_mask = df['sport'] == 'basketball_ncaab'
-    ncaaf_mask = df['sport'] == 'americanfootball_ncaaf'
+def calculate_no_vig_probabilities(df, threshold=PLAY_THRESHOLD):
+    # College sports (NCAAB, NCAAF) are priced off betonlineag, everything else off pinnacle
+    college_mask = df['sport'].isin(COLLEGE_SPORT_KEYS)
     
     # Initialize columns with None
     df['no_vig_over'] = None
     df['no_vig_under'] = None
     
     # Process NCAAB and NCAAF games using betonlineag odds
-    betonline_rows = df[ncaab_mask | ncaaf_mask].index
+    betonline_rows = df[college_mask].index
     for idx in betonline_rows:
         over_odds = df.loc[idx, 'betonlineag_over_price']
         under_odds = df.loc[idx, 'betonlineag_under_price']
@@ -91,7 +105,7 @@ def calculate_no_vig_probabilities(df):
         df.loc[idx, 'no_vig_under'] = no_vig_under
     
     # Process other sports using pinnacle odds
-    other_rows = df[~(ncaab_mask | ncaaf_mask)].index
+    other_rows = df[~college_mask].index
     for idx in other_rows:
         over_odds = df.loc[idx, 'pinnacle_over_price']
         under_odds = df.loc[idx, 'pinnacle_under_price']
@@ -99,12 +113,16 @@ def calculate_no_vig_probabilities(df):
         df.loc[idx, 'no_vig_over'] = no_vig_over
         df.loc[idx, 'no_vig_under'] = no_vig_under
     
+    return mark_plays(df, threshold)
+
+def mark_plays(df, threshold=PLAY_THRESHOLD):
+    """Set the play and direction columns from the no-vig probabilities"""
     # Add play and direction columns based on probabilities
     df['play'] = 'no play'
     df['direction'] = None
     
-    # Mask for plays where either probability exceeds 0.55
-    play_mask = (df['no_vig_over'] > 0.55) | (df['no_vig_under'] > 0.55)
+    # Mask for plays where either probability exceeds the threshold
+    play_mask = (df['no_vig_over'] > threshold) | (df['no_vig_under'] > threshold)
     df.loc[play_mask, 'play'] = 'PLAY'
     
     # Set direction based on which probability is higher
@@ -113,31 +131,21 @@ def calculate_no_vig_probabilities(df):
     
     return df
 
-def get_valid_combinations(plays_df):
-    """
-    Generate valid combinations of plays (3, 5, and 7 picks) ensuring no duplicate
-    game_ids or players within each combination.
-    """
+def get_combo_key(combo):
+    # Create a unique key for each combination from its prop_ids
+    sorted_plays = sorted([f"{row['prop_id']}" for row in combo])
+    return '|'.join(sorted_plays)
+
+def find_valid_combinations(plays_df, submitted_combos=()):
+    """Enumerate the 3, 5 and 7 pick combinations that are valid and not yet submitted"""
     def is_valid_combination(combo):
         # Check for unique game_ids and players in the combination
         game_ids = set(row['game_id_odds'] for row in combo)
         player_ids = set(row['player_id'] for row in combo)
         return (len(game_ids) == len(combo) and 
                 len(player_ids) == len(combo))
-    
-    def get_combo_key(combo):
-        # Create a unique key for each combination using player_id and bid_stats_name
-        sorted_plays = sorted([f"{row['prop_id']}" for row in combo])
-        return '|'.join(sorted_plays)
-    
-    # Load previously submitted combinations
-    submitted_combos = set()
-    try:
-        with open('data/submitted_combinations.txt', 'r') as f:
-            submitted_combos = set(line.strip() for line in f)
-    except FileNotFoundError:
-        # File doesn't exist yet, that's okay
-        pass
+
+    submitted_combos = set(submitted_combos)
     
     # Convert DataFrame rows to dictionaries for easier handling
     plays_list = plays_df.to_dict('records')
@@ -154,8 +162,45 @@ def get_valid_combinations(plays_df):
             combo_key = get_combo_key(combo)
             if is_valid_combination(combo) and combo_key not in submitted_combos:
                 valid_combinations[size].append(combo)
-        
-        # Randomize the order of combinations for each size
+
+    return valid_combinations
+
+def get_valid_combinations(plays_df, history_file=SUBMITTED_COMBINATIONS_FILE, cache_name='combinations'):
+    """
+    Generate valid combinations of plays (3, 5, and 7 picks) ensuring no duplicate
+    game_ids or players within each combination.
+    """
+    # The scrape time changes every run: keep it out of the cache key and re-attach it to the legs
+    fetched_at = {}
+    if 'fetched_at' in plays_df.columns:
+        fetched_at = dict(zip(plays_df['prop_id'], plays_df['fetched_at']))
+        plays_df = plays_df.drop(columns='fetched_at')
+
+    # Load previously submitted combinations
+    submitted_combos = set()
+    try:
+        with open(history_file, 'r') as f:
+            submitted_combos = set(line.strip() for line in f)
+    except FileNotFoundError:
+        # File doesn't exist yet, that's okay
+        pass
+
+    # Enumeration is skipped when the plays are unchanged; the submission history changes
+    # with every submitted slip, so it is filtered out afterwards instead of being part of the key
+    valid_combinations = cached_stage(cache_name, find_valid_combinations, args=(plays_df,), keep=2)
+    if submitted_combos:
+        valid_combinations = {
+            size: [combo for combo in combos if get_combo_key(combo) not in submitted_combos]
+            for size, combos in valid_combinations.items()
+        }
+    if fetched_at:
+        for combos in valid_combinations.values():
+            for combo in combos:
+                for leg in combo:
+                    leg['fetched_at'] = fetched_at.get(leg['prop_id'])
+
+    # Randomize the order of combinations for each size
+    for size in valid_combinations:
         random.shuffle(valid_combinations[size])
     
     # Print the number of valid combinations for each size
@@ -164,85 +209,250 @@ def get_valid_combinations(plays_df):
     
     return valid_combinations
 
-def submit_drafters_entry(combined_df, user_config):
+def submit_drafters_entry(combined_df, user_config, all_combinations=None, dry_run=False,
+                          max_quote_age=None, threshold=PLAY_THRESHOLD, exposure=None, enforce_locks=True,
+                          headers=None, entry_fee=entry_fee_drafters, history_file=SUBMITTED_COMBINATIONS_FILE,
+                          dedup_priority='main'):
     """
     Submit entries to drafters.com based on the calculated plays.
+    With dry_run the payloads are built but nothing is posted or recorded.
+    With max_quote_age (seconds) legs with older quotes are re-fetched and
+    re-checked against the threshold right before their slip is submitted,
+    choosing between standard and alternate quotes by dedup_priority as the merge did.
+    With an ExposureTracker, slips that would push a player, game or prop
+    over its cap are skipped.
+    Slips go out earliest-lock-first; with enforce_locks, a slip whose first
+    leg locks within LOCK_MARGIN when its turn comes is skipped.
+    headers, entry_fee and history_file default to the .env account.
     """
-    # Filter for only PLAY rows
-    plays_df = combined_df[combined_df['play'] == 'PLAY']
-    
-    # Get all valid combinations
-    all_combinations = get_valid_combinations(plays_df)
+    if all_combinations is None:
+        # Filter for only PLAY rows
+        plays_df = combined_df[combined_df['play'] == 'PLAY']
+        
+        # Get all valid combinations
+        all_combinations = get_valid_combinations(plays_df, history_file)
     
+    headers_drafters = headers if headers is not None else load_config()['headers_drafters']
     results = []
     newly_submitted = set()
+    locked_skips = 0
     
-    # Submit entries for each combination size and valid combination
-    for size, combos in all_combinations.items():
-        for combo in combos:
-            # Create unique key for this combination
-            combo_key = '|'.join(sorted([
-                f"{row['prop_id']}" 
-                for row in combo
-            ]))
-            
-            # Create selections dictionary for this combination
-            selections = {
-                row['prop_id']: row['direction'].lower()
-                for row in combo
-            }
+    # Submit slips earliest-lock-first, skipping those that lock before their turn comes
+    for size, combo, deadline in schedule_slips(all_combinations):
+        if enforce_locks and is_locking(deadline):
+            locked_skips += 1
+            continue
+        # Create unique key for this combination
+        combo_key = get_combo_key(combo)
+        
+        # Create selections dictionary for this combination
+        selections = {
+            row['prop_id']: row['direction'].lower()
+            for row in combo
+        }
+        
+        payload = {
+            "lg_name": "props-entry",
+            "entry_fee": str(entry_fee),
+            "selections": selections,
+            "PublicIP": user_config['public_ip'],
+            "country_name": user_config['country_name'],
+            "state_name": user_config['state_name'],
+            "user_dob": user_config['user_dob'],
+            "display_name": user_config['display_name'],
+            "ticket_id": 0,
+            "safety": False
+        }
+        
+        url = "https://node.drafters.com/props-game/join-props-game"
+
+        if exposure is not None and not exposure.allows(combo):
+            continue
+
+        if (max_quote_age is not None and not dry_run and
+                not revalidate_slip(combo, max_quote_age, threshold, dedup_priority)):
+            print(f"Skipping slip {combo_key}: edge no longer there")
+            continue
+
+        # Revalidation (with retries) can take longer than the lock margin
+        if enforce_locks and is_locking(deadline):
+            locked_skips += 1
+            continue
+        slack = deadline - time()
+
+        if dry_run:
+            results.append({
+                'size': size,
+                'selections': selections,
+                'slack': slack,
+                'response': None
+            })
+            if exposure is not None:
+                exposure.record(combo)
+            continue
+
+        try:
+            # POSTs are never retried: a timed out submission may still have gone through
+            response = http_request('POST', url, json=payload, headers=headers_drafters)
+            response_data = response.json()
+            print(f"Response from drafters.com: {response_data}")
             
-            payload = {
-                "lg_name": "props-entry",
-                "entry_fee": str(entry_fee_drafters),
-                "selections": selections,
-                "PublicIP": user_config['public_ip'],
-                "country_name": user_config['country_name'],
-                "state_name": user_config['state_name'],
-                "user_dob": user_config['user_dob'],
-                "display_name": user_config['display_name'],
-                "ticket_id": 0,
-                "safety": False
-            }
+            # Check for failed status or market error in response
+            if not response_data.get('status') or response_data.get('marketError'):
+                print(f"Error in submission: {response_data.get('message')}")
+                sys.exit(1)
             
-            url = "https://node.drafters.com/props-game/join-props-game"
-
-            try:
-                response = requests.post(url, json=payload, headers=headers_drafters)
-                response.raise_for_status()
-                response_data = response.json()
-                print(f"Response from drafters.com: {response_data}")
-                
-                # Check for failed status or market error in response
-                if not response_data.get('status') or response_data.get('marketError'):
-                    print(f"Error in submission: {response_data.get('message')}")
-                    sys.exit(1)
-                
-                results.append({
-                    'size': size,
-                    'selections': selections,
-                    'response': response_data
-                })
-                newly_submitted.add(combo_key)
-                # Write this combo to file immediately after adding it
-                with open('data/submitted_combinations.txt', 'a') as f:
-                    f.write(f"{combo_key}\n")
-                # Wait random time between 5-10 seconds after success
-                sleep_time = random.uniform(5, 10)
-                sleep(sleep_time)
-            except requests.exceptions.RequestException as e:
-                print(f"Fatal error occurred during submission process: {e}")
-                sys.exit(1)  # This will completely exit the program
+            results.append({
+                'size': size,
+                'selections': selections,
+                'slack': slack,
+                'response': response_data
+            })
+            print(f"Submitted {size}-pick slip with {slack / 60:.1f} min before its first lock")
+            newly_submitted.add(combo_key)
+            if exposure is not None:
+                exposure.record(combo)
+            # Write this combo to file immediately after adding it
+            with open(history_file, 'a') as f:
+                f.write(f"{combo_key}\n")
+            # Wait random time between 5-10 seconds after success
+            sleep_time = random.uniform(5, 10)
+            sleep(sleep_time)
+        except requests.exceptions.RequestException as e:
+            if getattr(e, 'kind', None) == 'timeout':
+                print(f"Submission timed out, check drafters.com before resubmitting: {combo_key}")
+            print(f"Fatal error occurred during submission process: {e}")
+            sys.exit(1)  # This will completely exit the program
     
+    if locked_skips:
+        print(f"Skipped {locked_skips} slips whose first leg locked before their turn")
     return results
 
+def resolve_exposure_limits(overrides=None):
+    """MAX_*_EXPOSURE settings with any non-None overrides applied, parsed with parse_limit"""
+    limits = dict(load_config()['exposure_limits'])
+    limits.update({kind: value for kind, value in (overrides or {}).items() if value is not None})
+    return {kind: parse_limit(value) for kind, value in limits.items()}
+
+def start_run(dry_run=False, offline=False, profile=False, use_cache=True, max_quote_age=None,
+              dedup_priority=None):
+    """
+    Apply the run-wide switches (stage cache, profiling) and resolve the settings shared
+    by single- and multi-account runs. Returns (dry_run, max_quote_age, dedup_priority).
+    """
+    if dedup_priority is None:
+        dedup_priority = load_config()['dedup_priority']
+    if max_quote_age is None:
+        max_quote_age = load_config()['quote_max_age']
+    if max_quote_age < 0:
+        max_quote_age = None
+    # Profiles of cache hits would only show pickle loads
+    set_cache_enabled(use_cache and not profile)
+    if profile:
+        enable_profiling()
+    if offline:
+        dry_run = True
+    return dry_run, max_quote_age, dedup_priority
+
+def build_and_submit_slips(combined_df, user_config, limits, threshold=PLAY_THRESHOLD, dry_run=False,
+                           offline=False, max_quote_age=None, dedup_priority='main', headers=None,
+                           entry_fee=entry_fee_drafters, history_file=SUBMITTED_COMBINATIONS_FILE,
+                           exposure_file=EXPOSURE_FILE, cache_name='combinations', profile_stages=True):
+    """
+    Build the not yet submitted slips from the frame's plays, dropping plays about
+    to lock, and submit them under the exposure limits. Accounts running
+    concurrently pass profile_stages=False since their stages would overlap.
+    """
+    stage = profile_stage if profile_stages else lambda name, **kwargs: nullcontext()
+    with stage('get_valid_combinations', track_allocations=True):
+        plays_df = combined_df[combined_df['play'] == 'PLAY']
+        if not offline:
+            plays_df = drop_locking_plays(plays_df)
+        all_combinations = get_valid_combinations(plays_df, history_file, cache_name=cache_name)
+
+    with stage('submit_drafters_entry'):
+        return submit_drafters_entry(combined_df, user_config, all_combinations=all_combinations,
+                                     dry_run=dry_run, max_quote_age=max_quote_age, threshold=threshold,
+                                     exposure=ExposureTracker(limits, path=exposure_file, persist=not dry_run),
+                                     enforce_locks=not offline, headers=headers, entry_fee=entry_fee,
+                                     history_file=history_file, dedup_priority=dedup_priority)
+
+def prepare_combined_data(league_ids=None, workers=None, offline=False, threshold=PLAY_THRESHOLD,
+                          dedup_priority='main'):
+    """
+    Scrape (or load) both sources, merge them and add no-vig probabilities.
+    Returns the combined frame, or None if one of the sources had no data.
+    """
+    if offline:
+        with profile_stage('load_saved_data'):
+            drafters_df, odds_df = load_saved_data()
+    else:
+        with profile_stage('fetch_props_games'):
+            drafters_df = fetch_props_games(league_ids)
+        with profile_stage('process_all_sports'):
+            odds_df = process_all_sports(drafters_df['game_id'].unique().tolist(), workers=workers)
+
+    # Fetch times change every run: keep them out of the cached stages' inputs and attach them afterwards
+    fetched_at = None
+    if odds_df is not None and 'fetched_at' in odds_df.columns:
+        fetched_at = odds_df.groupby('game_id')['fetched_at'].min().to_dict()
+        odds_df = odds_df.drop(columns='fetched_at')
+
+    with profile_stage('merge_drafters_and_odds', track_allocations=True):
+        combined_df = cached_stage('merge', merge_drafters_and_odds, args=(drafters_df, odds_df),
+                                   params={'dedup_priority': dedup_priority})
+    if combined_df is None:
+        return None
+
+    with profile_stage('calculate_no_vig_probabilities'):
+        combined_df = cached_stage('no_vig', calculate_no_vig_probabilities, args=(combined_df,),
+                                   params={'threshold': threshold})
+    if fetched_at is not None:
+        combined_df['fetched_at'] = combined_df['game_id_odds'].map(fetched_at)
+    save_csv_atomic(combined_df, COMBINED_DATA_FILE)
+    print("Data successfully combined, no-vig probabilities added, and saved to data/combined_props_data.csv")
+    if not offline:
+        archive_combined_data(combined_df)
+    return combined_df
+
+def run_pipeline(league_ids=None, dry_run=False, workers=None, offline=False, profile=False,
+                 use_cache=True, threshold=PLAY_THRESHOLD, max_quote_age=None, exposure_limits=None,
+                 dedup_priority=None):
+    """
+    Scrape both sources, compute no-vig probabilities and submit entries.
+    With dry_run the plays and slips are computed but nothing is submitted.
+    Offline runs replay the data saved by the previous run and never submit.
+    With profile each stage is profiled and the results written to data/profiles/;
+    profiling turns the stage cache off so the stages themselves are measured.
+    Otherwise stages whose inputs are unchanged reuse their cached output unless use_cache is False.
+    Legs with quotes older than max_quote_age seconds (default QUOTE_MAX_AGE_SECONDS)
+    are revalidated right before submission; pass a negative age to disable.
+    exposure_limits ({'player', 'game', 'prop'} -> "5" or "0.25") override the
+    MAX_*_EXPOSURE settings; limits persist across runs in data/exposure_counts.json.
+    dedup_priority ('main' or 'vig', default DEDUP_PRIORITY) picks between duplicate
+    standard and alternate odds rows before the merge.
+    """
+    dry_run, max_quote_age, dedup_priority = start_run(dry_run, offline=offline, profile=profile,
+                                                       use_cache=use_cache, max_quote_age=max_quote_age,
+                                                       dedup_priority=dedup_priority)
+    limits = resolve_exposure_limits(exposure_limits)
+
+    combined_df = prepare_combined_data(league_ids, workers=workers, offline=offline,
+                                        threshold=threshold, dedup_priority=dedup_priority)
+    if combined_df is None:
+        write_summary()
+        return None
+
+    result = build_and_submit_slips(combined_df, load_config()['user_config'], limits, threshold=threshold,
+                                    dry_run=dry_run, offline=offline, max_quote_age=max_quote_age,
+                                    dedup_priority=dedup_priority)
+    write_summary()
+
+    if dry_run:
+        print(f"Dry run: built {len(result)} slips from {(combined_df['play'] == 'PLAY').sum()} plays, nothing submitted")
+    elif result:
+        print("Successfully submitted entry to drafters.com")
+    return result
+
 if __name__ == "__main__":
-    combined_df = combine_drafters_and_odds_data()
-    if combined_df is not None:
-        combined_df = calculate_no_vig_probabilities(combined_df)
-        combined_df.to_csv('data/combined_props_data.csv', index=False)
-        print("Data successfully combined, no-vig probabilities added, and saved to data/combined_props_data.csv")
-        
-        result = submit_drafters_entry(combined_df, user_config)
-        if result:
-            print("Successfully submitted entry to drafters.com")
+    run_pipeline()
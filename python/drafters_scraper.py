@@ -1,8 +1,10 @@
-import requests
 import json
 import pandas as pd
 from time import sleep
-from functions_libraries import headers_drafters, get_sport_selections
+from functions_libraries import load_config, get_sport_selections
+from line_history import record_drafters_snapshot
+from stage_cache import cached_stage
+from http_client import HttpError, get_json
 
 def flatten_player_data(player):
     """Flatten nested player data into a single dictionary"""
@@ -30,9 +32,11 @@ def flatten_player_data(player):
     }
     return flat_data
 
-def fetch_props_games():
-    # Get user's sport selections
-    league_ids = get_sport_selections()
+def fetch_props_games(league_ids=None):
+    # Get user's sport selections unless leagues were passed in
+    if league_ids is None:
+        league_ids = get_sport_selections()
+    headers_drafters = load_config()['headers_drafters']
     
     # Base URL for the API
     base_url = "https://node.drafters.com/props-game/get-props-games/{league_id}?stats="
@@ -47,28 +51,38 @@ def fetch_props_games():
             url = base_url.format(league_id=league_id)
             
             # Make the request
-            response = requests.get(url, headers=headers_drafters)
-            if response.status_code == 200:
-                data = response.json()
-                # Check if the response has the expected structure
-                if data.get('entities'):
-                    for entity in data['entities']:
-                        if 'players' in entity:
-                            # Process each player in the entity
-                            for player in entity['players']:
-                                flat_player = flatten_player_data(player)
-                                all_players_data.append(flat_player)
-                
-                print(f"Successfully fetched data for league ID: {league_id}")
-            else:
-                print(f"Failed to fetch data for league ID: {league_id}. Status code: {response.status_code}")
+            data = get_json(url, headers=headers_drafters)
+            # Check if the response has the expected structure
+            if data.get('entities'):
+                for entity in data['entities']:
+                    if 'players' in entity:
+                        # Process each player in the entity
+                        for player in entity['players']:
+                            flat_player = flatten_player_data(player)
+                            all_players_data.append(flat_player)
+            
+            print(f"Successfully fetched data for league ID: {league_id}")
             
             # Add a small delay between requests
             sleep(1)
             
+        except HttpError as e:
+            print(f"Failed to fetch data for league ID: {league_id}. {e}")
         except Exception as e:
             print(f"Error fetching game ID {league_id}: {str(e)}")
+
+    # Map the board's stats, skipped when it is identical to a previous run
+    df = cached_stage('drafters_board', build_drafters_dataframe, args=(all_players_data,))
     
+    # Save to CSV
+    df.to_csv('drafters_data.csv', index=False)
+    print("Data saved to drafters_data.csv")
+    record_drafters_snapshot(df)
+    
+    return df
+
+def build_drafters_dataframe(all_players_data):
+    """Map the flattened Drafters players' stats to odds API market keys"""
     # Convert to DataFrame
     df = pd.DataFrame(all_players_data)
     
@@ -115,11 +129,6 @@ def fetch_props_games():
     # Filter out rows with unmapped stats and map the rest
     df = df[df['bid_stats_name'].isin(stats_mapping.keys())]
     df['bid_stats_name'] = df['bid_stats_name'].map(stats_mapping)
-    
-    # Save to CSV
-    df.to_csv('drafters_data.csv', index=False)
-    print("Data saved to drafters_data.csv")
-    
     return df
 
 if __name__ == "__main__":
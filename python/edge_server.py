@@ -0,0 +1,264 @@
+"""
+Resident in-memory edge index served over a local HTTP/JSON API.
+
+Holds the latest combined props frame in a list sorted by edge, with
+secondary indexes by sport, game and player (each also sorted by edge) and a
+lock time index. The CSV written by each run is polled and applied as an
+incremental diff keyed on prop_id, so unchanged props are not re-indexed.
+
+Queries:
+    GET  /edges?sport=NHL&direction=UNDER&locks_within=7200&limit=20
+         optional: game=<odds event id>, player=<name>, min_edge=<float>, all=1 (include non-plays)
+    GET  /health
+    POST /reload    re-read the CSV now instead of waiting for the next poll
+
+Edge is the no-vig probability of the chosen direction minus 0.5.
+"""
+import bisect
+import csv
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from functions_libraries import SPORT_LEAGUES, parse_lock_time
+
+COMBINED_DATA_FILE = 'data/combined_props_data.csv'
+DEFAULT_PORT = 8765
+POLL_INTERVAL = 2
+
+LEAGUE_ID_TO_NAME = {str(league_id): name for name, league_id in SPORT_LEAGUES.items()}
+
+def parse_float(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if number != number else number
+
+def build_entry(row):
+    """Reduce a CSV row to the fields served by the index, or None if it has no probabilities"""
+    no_vig_over = parse_float(row.get('no_vig_over'))
+    no_vig_under = parse_float(row.get('no_vig_under'))
+    if no_vig_over is None or no_vig_under is None:
+        return None
+    direction = 'OVER' if no_vig_over > no_vig_under else 'UNDER'
+    probability = max(no_vig_over, no_vig_under)
+    return {
+        'prop_id': row['prop_id'],
+        'player_name': row.get('player_name'),
+        'market_key': row.get('market_key') or row.get('bid_stats_name'),
+        'line': parse_float(row.get('bid_stats_value')),
+        'direction': direction,
+        'probability': probability,
+        'edge': probability - 0.5,
+        'play': row.get('play') == 'PLAY',
+        'sport': LEAGUE_ID_TO_NAME.get(str(row.get('game_id_drafters', '')).split('.')[0], row.get('sport')),
+        'game_id': row.get('game_id_odds'),
+        'lock_time': parse_lock_time(row.get('lock_time'))
+    }
+
+class EdgeIndex:
+    """Props sorted by edge with secondary indexes; all lists hold (-edge, prop_id) or (lock_time, prop_id)"""
+
+    SECONDARY_FIELDS = {'sport': 'sport', 'game': 'game_id', 'player': 'player_name'}
+
+    def __init__(self):
+        self.entries = {}
+        self.by_edge = []
+        self.by_lock = []
+        self.secondary = {name: {} for name in self.SECONDARY_FIELDS}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def index_key(value):
+        """Secondary index keys are case-insensitive"""
+        return str(value).lower() if value is not None else None
+
+    def _insert(self, entry):
+        edge_key = (-entry['edge'], entry['prop_id'])
+        bisect.insort(self.by_edge, edge_key)
+        for name, field in self.SECONDARY_FIELDS.items():
+            bisect.insort(self.secondary[name].setdefault(self.index_key(entry[field]), []), edge_key)
+        if entry['lock_time'] is not None:
+            bisect.insort(self.by_lock, (entry['lock_time'], entry['prop_id']))
+        self.entries[entry['prop_id']] = entry
+
+    def _remove(self, prop_id):
+        entry = self.entries.pop(prop_id)
+        edge_key = (-entry['edge'], prop_id)
+
+        def remove_from(sorted_list, key):
+            i = bisect.bisect_left(sorted_list, key)
+            if i < len(sorted_list) and sorted_list[i] == key:
+                del sorted_list[i]
+
+        remove_from(self.by_edge, edge_key)
+        for name, field in self.SECONDARY_FIELDS.items():
+            remove_from(self.secondary[name].get(self.index_key(entry[field]), []), edge_key)
+        if entry['lock_time'] is not None:
+            remove_from(self.by_lock, (entry['lock_time'], prop_id))
+
+    def apply(self, entries):
+        """Diff the new snapshot against the index; returns (added, updated, removed) counts"""
+        added = updated = removed = 0
+        with self.lock:
+            for prop_id in set(self.entries) - set(entries):
+                self._remove(prop_id)
+                removed += 1
+            for prop_id, entry in entries.items():
+                current = self.entries.get(prop_id)
+                if current == entry:
+                    continue
+                if current is not None:
+                    self._remove(prop_id)
+                    updated += 1
+                else:
+                    added += 1
+                self._insert(entry)
+        return added, updated, removed
+
+    def query(self, sport=None, game=None, player=None, direction=None, locks_within=None,
+              min_edge=None, plays_only=True, limit=20, now=None):
+        """Top props by edge matching every given filter"""
+        now = time.time() if now is None else now
+        with self.lock:
+            # Start from the smallest edge-sorted candidate list
+            candidates = self.by_edge
+            for name, value in (('sport', sport), ('game', game), ('player', player)):
+                if value is not None:
+                    index_list = self.secondary[name].get(self.index_key(value), [])
+                    if len(index_list) < len(candidates):
+                        candidates = index_list
+
+            if locks_within is not None:
+                lo = bisect.bisect_left(self.by_lock, (now,))
+                hi = bisect.bisect_right(self.by_lock, (now + locks_within, chr(0x10FFFF)))
+                lock_range = self.by_lock[lo:hi]
+                if len(lock_range) < len(candidates):
+                    # Fewer props lock in the window than match the other filters: sort just those
+                    candidates = sorted((-self.entries[prop_id]['edge'], prop_id) for _, prop_id in lock_range)
+
+            results = []
+            for neg_edge, prop_id in candidates:
+                entry = self.entries[prop_id]
+                if min_edge is not None and -neg_edge < min_edge:
+                    break
+                if plays_only and not entry['play']:
+                    continue
+                if sport is not None and self.index_key(entry['sport']) != self.index_key(sport):
+                    continue
+                if game is not None and self.index_key(entry['game_id']) != self.index_key(game):
+                    continue
+                if player is not None and self.index_key(entry['player_name']) != self.index_key(player):
+                    continue
+                if direction is not None and entry['direction'] != direction.upper():
+                    continue
+                if locks_within is not None and (entry['lock_time'] is None or
+                                                 not now <= entry['lock_time'] <= now + locks_within):
+                    continue
+                results.append(entry)
+                if len(results) >= limit:
+                    break
+            return results
+
+def load_entries(path):
+    """Read the combined CSV into {prop_id: entry}, or None if it has no probability columns"""
+    entries = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        if not {'no_vig_over', 'no_vig_under'} <= set(reader.fieldnames or []):
+            return None
+        for row in reader:
+            entry = build_entry(row)
+            if entry is not None:
+                # Keep the strongest quote if a prop matched more than one odds row
+                current = entries.get(entry['prop_id'])
+                if current is None or entry['edge'] > current['edge']:
+                    entries[entry['prop_id']] = entry
+    return entries
+
+def reload_index(index, path):
+    """Apply the current CSV to the index and log what changed"""
+    start = time.perf_counter()
+    entries = load_entries(path)
+    if entries is None:
+        print(f"Ignoring {path}: no no-vig probabilities in this snapshot")
+        return
+    added, updated, removed = index.apply(entries)
+    print(f"Index updated from {path}: {added} added, {updated} updated, {removed} removed "
+          f"({(time.perf_counter() - start) * 1000:.1f} ms, {len(index.entries)} props)")
+
+def watch_file(index, path, interval):
+    """Poll the CSV and re-index whenever a run rewrites it"""
+    last_mtime = None
+    while True:
+        try:
+            mtime = os.path.getmtime(path)
+            if mtime != last_mtime:
+                last_mtime = mtime
+                reload_index(index, path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Warning: could not reload {path}: {e}")
+        time.sleep(interval)
+
+def make_handler(index, path):
+    class EdgeRequestHandler(BaseHTTPRequestHandler):
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            if url.path == '/health':
+                return self.send_json(200, {'props': len(index.entries)})
+            if url.path != '/edges':
+                return self.send_json(404, {'error': 'not found'})
+            try:
+                start = time.perf_counter()
+                results = index.query(
+                    sport=params.get('sport'),
+                    game=params.get('game'),
+                    player=params.get('player'),
+                    direction=params.get('direction'),
+                    locks_within=float(params['locks_within']) if 'locks_within' in params else None,
+                    min_edge=float(params['min_edge']) if 'min_edge' in params else None,
+                    plays_only=params.get('all') != '1',
+                    limit=int(params.get('limit', 20))
+                )
+                took_ms = (time.perf_counter() - start) * 1000
+            except ValueError as e:
+                return self.send_json(400, {'error': str(e)})
+            self.send_json(200, {'count': len(results), 'took_ms': round(took_ms, 3), 'edges': results})
+
+        def do_POST(self):
+            if urlsplit(self.path).path != '/reload':
+                return self.send_json(404, {'error': 'not found'})
+            reload_index(index, path)
+            self.send_json(200, {'props': len(index.entries)})
+
+        def log_message(self, format, *args):
+            pass
+
+    return EdgeRequestHandler
+
+def serve(path=COMBINED_DATA_FILE, host='127.0.0.1', port=DEFAULT_PORT, poll_interval=POLL_INTERVAL):
+    """Run the edge index server until interrupted"""
+    index = EdgeIndex()
+    threading.Thread(target=watch_file, args=(index, path, poll_interval), daemon=True).start()
+    server = ThreadingHTTPServer((host, port), make_handler(index, path))
+    print(f"Serving edges from {path} on http://{host}:{port}/edges")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,100 @@
+"""
+Per-player, per-game and per-prop exposure caps across slips.
+
+Limits are absolute slip counts (e.g. "5") or fractions of the slips
+submitted so far (e.g. "0.25"). Counters are updated as each slip is
+submitted, so checking a slip only touches its own legs, and are stored in
+data/exposure_counts.json next to the submission history. Counters reset when
+the date changes since the previous day's games have all locked.
+"""
+import json
+import math
+import os
+import tempfile
+from datetime import date
+
+EXPOSURE_FILE = 'data/exposure_counts.json'
+
+# Fractional caps are taken of at least this many slips so the first few slips are not over-restricted
+MIN_FRACTION_DENOMINATOR = 10
+
+EXPOSURE_KINDS = ['player', 'game', 'prop']
+
+def parse_limit(value):
+    """'5' -> 5 slips, '0.25' -> 25% of slips, empty/None -> no limit"""
+    if value is None or value == '':
+        return None
+    number = float(value)
+    if number <= 0:
+        raise ValueError(f"Exposure limit must be positive: {value}")
+    return number if number < 1 else int(number)
+
+def get_leg_keys(leg):
+    """The exposure keys a leg counts against"""
+    return {
+        'player': str(leg['player_id']),
+        'game': str(leg['game_id_odds']),
+        'prop': str(leg['prop_id'])
+    }
+
+class ExposureTracker:
+    """Incremental exposure counters; allows()/record() cost O(slip size)"""
+
+    def __init__(self, limits, path=EXPOSURE_FILE, persist=True):
+        self.limits = {kind: limits.get(kind) for kind in EXPOSURE_KINDS}
+        self.path = path
+        self.persist = persist
+        self.counts = self.load()
+
+    def empty_counts(self):
+        counts = {kind: {} for kind in EXPOSURE_KINDS}
+        counts['date'] = date.today().isoformat()
+        counts['total_slips'] = 0
+        return counts
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                counts = json.load(f)
+        except FileNotFoundError:
+            return self.empty_counts()
+        if counts.get('date') != date.today().isoformat():
+            return self.empty_counts()
+        return counts
+
+    def save(self):
+        if not self.persist:
+            return
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.counts, f)
+        os.replace(tmp_path, self.path)
+
+    def get_cap(self, kind):
+        """Maximum number of slips a single key of this kind may appear in after the next slip"""
+        limit = self.limits[kind]
+        if limit is None:
+            return None
+        if isinstance(limit, int):
+            return limit
+        denominator = max(self.counts['total_slips'] + 1, MIN_FRACTION_DENOMINATOR)
+        return max(1, math.floor(limit * denominator))
+
+    def allows(self, combo):
+        """True if adding this slip keeps every player, game and prop within its cap"""
+        caps = {kind: self.get_cap(kind) for kind in EXPOSURE_KINDS}
+        for leg in combo:
+            for kind, key in get_leg_keys(leg).items():
+                if caps[kind] is not None and self.counts[kind].get(key, 0) + 1 > caps[kind]:
+                    return False
+        return True
+
+    def record(self, combo):
+        """Count a submitted slip and persist the counters"""
+        for leg in combo:
+            for kind, key in get_leg_keys(leg).items():
+                self.counts[kind][key] = self.counts[kind].get(key, 0) + 1
+        self.counts['total_slips'] += 1
+        self.save()
@@ -1,38 +1,83 @@
 ### Functions and libraries
-import requests
-import pandas as pd
+# Configuration and heavy dependencies (requests, pandas, dotenv) are loaded lazily
+# so that importing this module stays cheap for lightweight CLI commands.
 import os
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
+import sys
+from functools import lru_cache
 
 # Initialize empty lists/dictionaries
 appearance_fees = {}
 used_combinations = {}
 
-# API Configuration
-api_key = os.getenv('ODDS_API_KEY')  # API Key (from Odds API)
-authorization_token = os.getenv('DRAFTERS_AUTH_TOKEN')
-user_config = {
-    "display_name": os.getenv('DISPLAY_NAME'),
-    "public_ip": os.getenv('PUBLIC_IP'),
-    "country_name": os.getenv('COUNTRY_NAME'),
-    "state_name": os.getenv('STATE_NAME'),
-    "user_dob": os.getenv('USER_DOB')
-}
-
 BASE_URL = "https://api.the-odds-api.com/v4/sports/"
 
 entry_fee_drafters = 2
 
-headers_drafters = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3',
-    'Accept-Language': 'en-US,en;q=0.9', 
-    'Referer': 'https://www.google.com/',
-    'Accept': 'application/json',
-    'Authorization': authorization_token
-}
+# Sports priced off betonlineag; every other sport uses pinnacle
+COLLEGE_SPORT_KEYS = ['basketball_ncaab', 'americanfootball_ncaaf']
+
+# Environment variables that must be set for a full run
+REQUIRED_ENV_VARS = [
+    'ODDS_API_KEY',
+    'DRAFTERS_AUTH_TOKEN',
+    'DISPLAY_NAME',
+    'PUBLIC_IP',
+    'COUNTRY_NAME',
+    'STATE_NAME',
+    'USER_DOB'
+]
+
+@lru_cache(maxsize=None)
+def load_config():
+    """Load environment variables (once) and build the API configuration"""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    authorization_token = os.getenv('DRAFTERS_AUTH_TOKEN')
+    return {
+        # API Key (from Odds API)
+        'api_key': os.getenv('ODDS_API_KEY'),
+        'authorization_token': authorization_token,
+        'user_config': {
+            "display_name": os.getenv('DISPLAY_NAME'),
+            "public_ip": os.getenv('PUBLIC_IP'),
+            "country_name": os.getenv('COUNTRY_NAME'),
+            "state_name": os.getenv('STATE_NAME'),
+            "user_dob": os.getenv('USER_DOB')
+        },
+        # Number of worker processes used to fetch events (1 = single process)
+        'shard_workers': int(os.getenv('SHARD_WORKERS', '1')),
+        # Quotes older than this are re-fetched right before their slip is submitted
+        'quote_max_age': float(os.getenv('QUOTE_MAX_AGE_SECONDS', '120')),
+        # Which duplicate standard/alternate odds row to keep: 'main' market or tighter 'vig'
+        'dedup_priority': os.getenv('DEDUP_PRIORITY', 'main'),
+        # Exposure caps per player/game/prop: a slip count ("5") or a fraction of slips ("0.25")
+        'exposure_limits': {
+            'player': os.getenv('MAX_PLAYER_EXPOSURE'),
+            'game': os.getenv('MAX_GAME_EXPOSURE'),
+            'prop': os.getenv('MAX_PROP_EXPOSURE')
+        },
+        'headers_drafters': build_drafters_headers(authorization_token)
+    }
+
+def build_drafters_headers(authorization_token):
+    """Request headers for the Drafters API authenticated as one account"""
+    return {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3',
+        'Accept-Language': 'en-US,en;q=0.9', 
+        'Referer': 'https://www.google.com/',
+        'Accept': 'application/json',
+        'Authorization': authorization_token
+    }
+
+CONFIG_ATTRIBUTES = {'api_key', 'authorization_token', 'user_config', 'shard_workers', 'quote_max_age', 'exposure_limits', 'dedup_priority',
+                     'headers_drafters'}
+
+def __getattr__(name):
+    """Keep `from functions_libraries import api_key` etc. working by loading config on first access"""
+    if name in CONFIG_ATTRIBUTES:
+        return load_config()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 default_col_names = ["player_name", "book_1_line", "book_1_under_price", "book_1_over_price", 
                      "book_2_line", "book_2_under_price", "book_2_over_price", 
@@ -259,8 +304,21 @@ SPORT_LEAGUES = {
     'MLB': 3
 }
 
-def get_sport_selections():
-    """Interactive function to get sport selections from user"""
+def get_sport_selections(sports=None):
+    """
+    Get sport selections as a list of league ids.
+    If sports (e.g. ['NFL', 'NBA']) is given the selection is non-interactive,
+    otherwise the user is prompted for each sport.
+    """
+    if sports is not None:
+        unknown = [sport for sport in sports if sport.upper() not in SPORT_LEAGUES]
+        if unknown:
+            raise ValueError(f"Unknown sports: {', '.join(unknown)}. Choose from {', '.join(SPORT_LEAGUES)}")
+        return [SPORT_LEAGUES[sport.upper()] for sport in sports]
+
+    if not sys.stdin.isatty():
+        raise RuntimeError("No sports given and stdin is not interactive; pass the sports to scrape explicitly")
+
     selected_leagues = []
     print("\nAvailable sports to scrape:")
     for sport in SPORT_LEAGUES:
@@ -274,19 +332,57 @@ def get_sport_selections():
     
     return selected_leagues
 
+def parse_lock_time(value):
+    """Parse a Drafters lock time (epoch seconds/ms or ISO 8601 string) to epoch seconds, or None"""
+    from datetime import datetime, timezone
+    if value is None or value == '':
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    if number != number:
+        # NaN
+        return None
+    # Millisecond timestamps
+    return number / 1000 if number > 1e11 else number
+
+def get_sharp_book(sport_key):
+    """Book whose prices are devigged for a sport: betonlineag for college sports, pinnacle otherwise"""
+    return 'betonlineag' if sport_key in COLLEGE_SPORT_KEYS else 'pinnacle'
+
+def devig_odds(over_decimal, under_decimal):
+    """Convert decimal odds to probabilities and remove the vig"""
+    over_prob = 1 / over_decimal
+    under_prob = 1 / under_decimal
+    total_prob = over_prob + under_prob
+    
+    # Normalize probabilities to remove vig
+    no_vig_over = over_prob / total_prob
+    no_vig_under = under_prob / total_prob
+    
+    return no_vig_over, no_vig_under
+
 def get_events(sport_key, api_key):
+    from http_client import get_json
     url = f"{BASE_URL}{sport_key}/odds/?apiKey={api_key}&regions=us_dfs&bookmakers=underdog&oddsFormat=decimal"
-    response = requests.get(url)
-    return response.json()
+    return get_json(url)
 
 def get_upcoming_player_props_by_market(sport_key, api_key, event_id, market_key):
+    from http_client import get_json
     books = "pinnacle,betonlineag"
     url = f"{BASE_URL}{sport_key}/events/{event_id}/odds?apiKey={api_key}&regions=eu&markets={market_key}&bookmakers={books}&oddsFormat=decimal"
-    response = requests.get(url)
-    return response.json()
+    return get_json(url)
 
 def process_yes_no_market(df_raw, book_num):
     """Process Yes/No market data into a standardized format"""
+    import pandas as pd
     if df_raw.empty:
         cols = ['player_name', f'book_{book_num}_line', 
                 f'book_{book_num}_under_price', f'book_{book_num}_over_price']
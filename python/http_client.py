@@ -0,0 +1,170 @@
+"""
+Shared HTTP layer for the Odds API and Drafters.
+
+Every request gets connect and read deadlines. Idempotent requests (GET) are
+retried with jittered exponential backoff on timeouts, connection errors, 429s
+and 5xx responses. Each host has a circuit breaker: after a run of consecutive
+failures it fails fast for a cooldown period, then lets a single trial request
+through. Failures are raised as HttpError with a `kind` so callers can report
+them instead of silently treating them as empty data.
+"""
+import random
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8
+
+# Consecutive failures before a host's circuit opens, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN = 60
+
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+# Errors in the request itself: retrying cannot help and the host is not at fault
+INVALID_REQUEST_ERRORS = (
+    requests.exceptions.InvalidURL,
+    requests.exceptions.MissingSchema,
+    requests.exceptions.InvalidSchema,
+    requests.exceptions.InvalidHeader,
+    requests.exceptions.URLRequired
+)
+
+class HttpError(requests.exceptions.RequestException):
+    """
+    A classified request failure. kind is one of 'timeout', 'connection',
+    'rate_limited', 'server_error', 'client_error', 'invalid_request' (a bad
+    URL or header, never retried), 'request' (any other requests failure,
+    e.g. a broken chunked body or too many redirects), 'bad_response' or
+    'circuit_open'.
+    """
+    def __init__(self, kind, url, message, status_code=None):
+        # Drop the query string so API keys never end up in logs
+        url = url.split('?')[0]
+        message = re.sub(r'(apiKey=)[^&\s]+', r'\1***', message)
+        super().__init__(f"{kind}: {message} ({url})")
+        self.kind = kind
+        self.url = url
+        self.status_code = status_code
+
+class CircuitOpenError(HttpError):
+    """Raised without sending anything while a host's circuit is open"""
+    def __init__(self, url, retry_in):
+        super().__init__('circuit_open', url, f"host is failing, retry in {retry_in:.0f}s")
+
+# Per-host breaker state: {'failures': int, 'opened_at': float or None, 'trial': bool}
+circuit_breakers = {}
+breaker_lock = threading.Lock()
+
+def get_host(url):
+    return urlsplit(url).netloc
+
+def check_circuit(url):
+    """Raise CircuitOpenError if the host's circuit is open; allows one trial request after the cooldown"""
+    with breaker_lock:
+        state = circuit_breakers.setdefault(get_host(url), {'failures': 0, 'opened_at': None, 'trial': False})
+        if state['opened_at'] is None:
+            return
+        elapsed = time.monotonic() - state['opened_at']
+        if elapsed < BREAKER_COOLDOWN or state['trial']:
+            raise CircuitOpenError(url, max(BREAKER_COOLDOWN - elapsed, 0))
+        # Half-open: let this request through as the trial
+        state['trial'] = True
+
+def record_success(url):
+    with breaker_lock:
+        circuit_breakers[get_host(url)] = {'failures': 0, 'opened_at': None, 'trial': False}
+
+def release_trial(url):
+    """Let another request be the half-open trial without counting this one as a host failure"""
+    with breaker_lock:
+        state = circuit_breakers.get(get_host(url))
+        if state is not None:
+            state['trial'] = False
+
+def record_failure(url):
+    with breaker_lock:
+        state = circuit_breakers.setdefault(get_host(url), {'failures': 0, 'opened_at': None, 'trial': False})
+        state['failures'] += 1
+        if state['trial'] or state['failures'] >= BREAKER_FAILURE_THRESHOLD:
+            if state['opened_at'] is None or state['trial']:
+                print(f"Circuit opened for {get_host(url)} after {state['failures']} consecutive failures")
+            state['opened_at'] = time.monotonic()
+            state['trial'] = False
+
+def get_backoff(attempt, response=None):
+    """Full-jitter exponential backoff, honouring Retry-After when the server sends it"""
+    if response is not None:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def classify_response(response):
+    """Return (kind, retryable) for an unsuccessful response"""
+    if response.status_code == 429:
+        return 'rate_limited', True
+    if response.status_code >= 500:
+        return 'server_error', True
+    return 'client_error', False
+
+def request(method, url, timeout=None, retries=MAX_RETRIES, **kwargs):
+    """
+    Send a request through the shared layer and return the successful response.
+    Only idempotent methods are retried. Raises HttpError on failure.
+    """
+    method = method.upper()
+    timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+    max_attempts = retries + 1 if method in IDEMPOTENT_METHODS else 1
+
+    for attempt in range(max_attempts):
+        check_circuit(url)
+        response = None
+        try:
+            response = requests.request(method, url, timeout=timeout, **kwargs)
+        except INVALID_REQUEST_ERRORS as e:
+            release_trial(url)
+            raise HttpError('invalid_request', url, str(e))
+        except requests.exceptions.Timeout as e:
+            error = HttpError('timeout', url, str(e))
+        except requests.exceptions.ConnectionError as e:
+            error = HttpError('connection', url, str(e))
+        except requests.exceptions.RequestException as e:
+            error = HttpError('request', url, str(e))
+        except BaseException:
+            # Count it so a half-open host's trial is always released
+            record_failure(url)
+            raise
+        else:
+            if response.ok:
+                record_success(url)
+                return response
+            kind, retryable = classify_response(response)
+            error = HttpError(kind, url, f"HTTP {response.status_code}: {response.text[:200]}",
+                              status_code=response.status_code)
+            if not retryable:
+                # The host answered, so it is up; the request itself was rejected
+                record_success(url)
+                raise error
+
+        record_failure(url)
+        if attempt + 1 < max_attempts:
+            sleep_time = get_backoff(attempt, response)
+            print(f"Request failed ({error.kind}), retrying in {sleep_time:.1f}s: {url.split('?')[0]}")
+            time.sleep(sleep_time)
+    raise error
+
+def get_json(url, **kwargs):
+    """GET a URL and decode its JSON body"""
+    response = request('GET', url, **kwargs)
+    try:
+        return response.json()
+    except ValueError as e:
+        raise HttpError('bad_response', url, f"invalid JSON: {e}", status_code=response.status_code)
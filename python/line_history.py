@@ -0,0 +1,232 @@
+"""
+Append-only line movement history.
+
+Every odds and Drafters snapshot is appended to a columnar store on disk:
+
+    data/line_history/<source>/
+        keys.csv           one (player, market, book) per line, row number = key id;
+                           alternate markets keep their _alternate suffix
+        timestamp.bin      int64 snapshot time (ns since epoch), non-decreasing
+        key_id.bin         int32 key id
+        line.bin           float64
+        over_price.bin     float64 (decimal odds, NaN when missing)
+        under_price.bin    float64 (decimal odds, NaN when missing)
+
+Columns are memory-mapped for reads. Because rows are appended in snapshot
+order the timestamp column is sorted, so time-range queries binary search to
+the first row they need instead of scanning the whole archive, and the key
+file indexes (player, market, book) to a small integer id.
+"""
+import csv
+import os
+import numpy as np
+import pandas as pd
+
+HISTORY_DIR = 'data/line_history'
+
+COLUMN_DTYPES = {
+    'timestamp': np.int64,
+    'key_id': np.int32,
+    'line': np.float64,
+    'over_price': np.float64,
+    'under_price': np.float64
+}
+
+def get_store_dir(source):
+    """Directory of the store for a source ('odds' or 'drafters')"""
+    return os.path.join(HISTORY_DIR, source)
+
+def load_keys(store_dir):
+    """Load the (player, market, book) -> key id index"""
+    keys = {}
+    path = os.path.join(store_dir, 'keys.csv')
+    if os.path.exists(path):
+        with open(path, newline='', encoding='utf-8') as f:
+            for key_id, row in enumerate(csv.reader(f)):
+                keys[tuple(row)] = key_id
+    return keys
+
+def count_complete_rows(store_dir):
+    """Number of rows present in every column file"""
+    sizes = {}
+    for name, dtype in COLUMN_DTYPES.items():
+        path = os.path.join(store_dir, f'{name}.bin')
+        sizes[name] = os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0
+    return min(sizes.values())
+
+def load_columns(store_dir):
+    """Memory-map every column, truncated to the number of complete rows"""
+    n_rows = count_complete_rows(store_dir)
+
+    columns = {}
+    for name, dtype in COLUMN_DTYPES.items():
+        if n_rows == 0:
+            columns[name] = np.empty(0, dtype=dtype)
+        else:
+            columns[name] = np.memmap(os.path.join(store_dir, f'{name}.bin'), dtype=dtype, mode='r', shape=(n_rows,))
+    return columns
+
+def append_snapshot(store_dir, snapshot_df, timestamp=None):
+    """
+    Append a snapshot with columns player_name, market_key, book, line, over_price, under_price.
+    Returns the timestamp (ns) the rows were stored under.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    if snapshot_df.empty:
+        return None
+
+    # Keep the timestamp column sorted even if the clock goes backwards
+    timestamp = pd.Timestamp.now(tz='UTC').value if timestamp is None else int(timestamp)
+    existing = load_columns(store_dir)['timestamp']
+    if len(existing):
+        timestamp = max(timestamp, int(existing[-1]))
+
+    # Drop any partial rows left by an interrupted append so the columns stay aligned
+    n_rows = count_complete_rows(store_dir)
+    for name, dtype in COLUMN_DTYPES.items():
+        path = os.path.join(store_dir, f'{name}.bin')
+        if os.path.exists(path) and os.path.getsize(path) != n_rows * np.dtype(dtype).itemsize:
+            os.truncate(path, n_rows * np.dtype(dtype).itemsize)
+
+    keys = load_keys(store_dir)
+    new_keys = []
+    key_ids = np.empty(len(snapshot_df), dtype=np.int32)
+    for i, key in enumerate(zip(snapshot_df['player_name'].astype(str),
+                                snapshot_df['market_key'].astype(str),
+                                snapshot_df['book'].astype(str))):
+        if key not in keys:
+            keys[key] = len(keys)
+            new_keys.append(key)
+        key_ids[i] = keys[key]
+
+    if new_keys:
+        with open(os.path.join(store_dir, 'keys.csv'), 'a', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(new_keys)
+
+    values = {
+        'timestamp': np.full(len(snapshot_df), timestamp, dtype=np.int64),
+        'key_id': key_ids,
+        'line': pd.to_numeric(snapshot_df['line'], errors='coerce').to_numpy(dtype=np.float64),
+        'over_price': pd.to_numeric(snapshot_df['over_price'], errors='coerce').to_numpy(dtype=np.float64),
+        'under_price': pd.to_numeric(snapshot_df['under_price'], errors='coerce').to_numpy(dtype=np.float64)
+    }
+    for name, dtype in COLUMN_DTYPES.items():
+        with open(os.path.join(store_dir, f'{name}.bin'), 'ab') as f:
+            f.write(values[name].astype(dtype, copy=False).tobytes())
+    return timestamp
+
+def odds_to_snapshot(odds_df):
+    """
+    Reshape the wide odds frame (one set of columns per book) into one row per
+    book and line. Alternate markets are stored under their own market key,
+    and rows repeated by the outer merge of the books are dropped.
+    """
+    books = [col[:-len('_line')] for col in odds_df.columns if col.endswith('_line')]
+    market_keys = odds_df['market_key'].astype(str)
+    if 'is_alternate' in odds_df.columns:
+        market_keys = market_keys.where(~odds_df['is_alternate'].fillna(False).astype(bool),
+                                        market_keys + '_alternate')
+    frames = []
+    for book in books:
+        book_df = odds_df[['player_name', f'{book}_line', f'{book}_over_price', f'{book}_under_price']].copy()
+        book_df.columns = ['player_name', 'line', 'over_price', 'under_price']
+        book_df.insert(1, 'market_key', market_keys)
+        book_df['book'] = book
+        book_df = book_df.dropna(subset=['line'])
+        frames.append(book_df.drop_duplicates(subset=['player_name', 'market_key', 'line'], keep='last'))
+    if not frames:
+        return pd.DataFrame(columns=['player_name', 'market_key', 'book', 'line', 'over_price', 'under_price'])
+    return pd.concat(frames, ignore_index=True)
+
+def drafters_to_snapshot(drafters_df):
+    """Reshape the Drafters board into snapshot rows (Drafters lines have no prices)"""
+    return pd.DataFrame({
+        'player_name': drafters_df['player_name'],
+        'market_key': drafters_df['bid_stats_name'],
+        'book': 'drafters',
+        'line': drafters_df['bid_stats_value'],
+        'over_price': np.nan,
+        'under_price': np.nan
+    })
+
+def record_odds_snapshot(odds_df):
+    """Append the combined odds frame from process_all_sports to the history"""
+    try:
+        append_snapshot(get_store_dir('odds'), odds_to_snapshot(odds_df))
+    except Exception as e:
+        print(f"Warning: could not record odds history: {e}")
+
+def record_drafters_snapshot(drafters_df):
+    """Append the Drafters board from fetch_props_games to the history"""
+    try:
+        append_snapshot(get_store_dir('drafters'), drafters_to_snapshot(drafters_df))
+    except Exception as e:
+        print(f"Warning: could not record drafters history: {e}")
+
+def rows_to_dataframe(store_dir, columns, row_slice, mask=None):
+    """Materialize a slice of the store (optionally masked) with the key columns decoded"""
+    data = {name: np.asarray(col[row_slice]) for name, col in columns.items()}
+    if mask is not None:
+        data = {name: values[mask] for name, values in data.items()}
+    df = pd.DataFrame(data)
+
+    keys_by_id = {key_id: key for key, key_id in load_keys(store_dir).items()}
+    decoded = [keys_by_id[key_id] for key_id in df['key_id']]
+    df['player_name'] = [key[0] for key in decoded]
+    df['market_key'] = [key[1] for key in decoded]
+    df['book'] = [key[2] for key in decoded]
+    df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
+    return df[['timestamp', 'player_name', 'market_key', 'book', 'line', 'over_price', 'under_price', 'key_id']]
+
+def get_line_movement(player_name, market_key, hours=6, book=None, source='odds'):
+    """
+    Every stored quote for a player/market (optionally one book) over the last N
+    hours. Standard and alternate quotes are both returned; pass the _alternate
+    market key for alternate lines only.
+    """
+    store_dir = get_store_dir(source)
+    markets = {market_key, f'{market_key}_alternate'}
+    key_ids = [key_id for (player, market, key_book), key_id in load_keys(store_dir).items()
+               if player == player_name and market in markets and (book is None or key_book == book)]
+    columns = load_columns(store_dir)
+    if not key_ids or len(columns['timestamp']) == 0:
+        return rows_to_dataframe(store_dir, columns, slice(0, 0))
+
+    cutoff = (pd.Timestamp.now(tz='UTC') - pd.Timedelta(hours=hours)).value
+    start = int(np.searchsorted(columns['timestamp'], cutoff, side='left'))
+    row_slice = slice(start, len(columns['timestamp']))
+    mask = np.isin(columns['key_id'][row_slice], key_ids)
+    return rows_to_dataframe(store_dir, columns, row_slice, mask).drop(columns='key_id')
+
+def get_price_moves(min_cents, book=None, source='odds', hours=6):
+    """
+    Props whose over or under price moved by more than min_cents (0.01 in decimal
+    odds) between their latest quote and their own previous quote on the same
+    line, within the last N hours. Each key is compared with itself, so runs
+    covering different leagues never hide each other's moves.
+    """
+    store_dir = get_store_dir(source)
+    columns = load_columns(store_dir)
+    if len(columns['timestamp']) == 0:
+        return pd.DataFrame()
+
+    cutoff = (pd.Timestamp.now(tz='UTC') - pd.Timedelta(hours=hours)).value
+    start = int(np.searchsorted(columns['timestamp'], cutoff, side='left'))
+    df = rows_to_dataframe(store_dir, columns, slice(start, len(columns['timestamp'])))
+    if book is not None:
+        df = df[df['book'] == book]
+
+    # Rows are in append order, so the last two rows of a key and line are its two latest
+    # quotes, even when two appends were stored under the same clamped timestamp
+    recency = df.groupby(['key_id', 'line'], sort=False).cumcount(ascending=False)
+    moves = pd.merge(
+        df.loc[recency == 1, ['key_id', 'line', 'over_price', 'under_price', 'timestamp']],
+        df[recency == 0],
+        on=['key_id', 'line'],
+        how='inner',
+        suffixes=('_previous', '')
+    )
+    moves['over_move_cents'] = (moves['over_price'] - moves['over_price_previous']) * 100
+    moves['under_move_cents'] = (moves['under_price'] - moves['under_price_previous']) * 100
+    moved = (moves['over_move_cents'].abs() > min_cents) | (moves['under_move_cents'].abs() > min_cents)
+    return moves[moved].drop(columns='key_id').reset_index(drop=True)
@@ -0,0 +1,126 @@
+"""
+Per-stage profiling for pipeline runs.
+
+When enabled, every `profile_stage` block writes to data/profiles/<run>/:
+    <stage>.prof     cProfile stats (load with pstats, snakeviz, ...)
+    <stage>.folded   sampled stacks in collapsed format for flamegraph.pl / speedscope
+and `write_summary` adds summary.txt with stage timings, the top-N hot
+functions and, for stages tracked with allocations, the top allocation sites.
+
+Only the calling process is profiled; sharded odds workers are not.
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_DIR = 'data/profiles'
+
+# Output directory of the current profiled run, None when profiling is off
+profile_output_dir = None
+profile_top_n = 25
+profile_sample_interval = 0.005
+stage_summaries = []
+
+def enable_profiling(output_dir=None, top_n=25, sample_interval=0.005):
+    """Turn on profiling for the rest of the run and return the output directory"""
+    global profile_output_dir, profile_top_n, profile_sample_interval
+    if output_dir is None:
+        output_dir = os.path.join(PROFILE_DIR, time.strftime('%Y%m%d-%H%M%S'))
+    os.makedirs(output_dir, exist_ok=True)
+    profile_output_dir = output_dir
+    profile_top_n = top_n
+    profile_sample_interval = sample_interval
+    stage_summaries.clear()
+    return output_dir
+
+def sample_stacks(thread_id, interval, stop_event, counts):
+    """Sample the target thread's stack until stopped, counting collapsed stacks"""
+    while not stop_event.wait(interval):
+        frame = sys._current_frames().get(thread_id)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        if stack:
+            counts[';'.join(reversed(stack))] += 1
+
+@contextmanager
+def profile_stage(name, track_allocations=False):
+    """Profile a pipeline stage; a no-op unless enable_profiling() was called"""
+    if profile_output_dir is None:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    counts = Counter()
+    stop_event = threading.Event()
+    sampler = threading.Thread(
+        target=sample_stacks,
+        args=(threading.get_ident(), profile_sample_interval, stop_event, counts),
+        daemon=True
+    )
+    if track_allocations:
+        tracemalloc.start()
+    sampler.start()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - start
+        stop_event.set()
+        sampler.join()
+
+        allocations = None
+        if track_allocations:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            allocations = (peak, snapshot.statistics('lineno')[:profile_top_n])
+
+        profiler.dump_stats(os.path.join(profile_output_dir, f'{name}.prof'))
+        with open(os.path.join(profile_output_dir, f'{name}.folded'), 'w') as f:
+            for stack, count in counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+        stats_stream = io.StringIO()
+        pstats.Stats(profiler, stream=stats_stream).sort_stats('cumulative').print_stats(profile_top_n)
+        stage_summaries.append({
+            'name': name,
+            'elapsed': elapsed,
+            'stats': stats_stream.getvalue(),
+            'allocations': allocations
+        })
+        print(f"Profiled stage {name}: {elapsed:.2f}s")
+
+def write_summary():
+    """Write summary.txt for the profiled run and return its path (None if profiling is off)"""
+    if profile_output_dir is None:
+        return None
+
+    path = os.path.join(profile_output_dir, 'summary.txt')
+    with open(path, 'w') as f:
+        f.write("Stage timings\n")
+        for summary in stage_summaries:
+            f.write(f"  {summary['name']:<32} {summary['elapsed']:>10.3f}s\n")
+
+        for summary in stage_summaries:
+            f.write(f"\n=== {summary['name']} ===\n")
+            f.write(summary['stats'])
+            if summary['allocations'] is not None:
+                peak, top_stats = summary['allocations']
+                f.write(f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB\n")
+                f.write(f"Top {len(top_stats)} allocation sites:\n")
+                for stat in top_stats:
+                    f.write(f"  {stat}\n")
+    print(f"Profile written to {profile_output_dir}")
+    return path
@@ -0,0 +1,117 @@
+"""
+Just-in-time revalidation of slip legs before submission.
+
+Odds are fetched at the start of a run but slips go out minutes later. Before
+each slip is submitted, legs whose quote is older than the allowed age have
+their event/market re-fetched (once per market, then shared by later slips),
+their no-vig probabilities recomputed and are checked against the threshold
+again. A slip with a leg whose edge is gone is skipped, and that leg is
+remembered so later slips containing it are skipped without another request.
+
+Accounts running concurrently share the re-fetched quotes; a leg that fails
+one account's threshold is only dead for that threshold.
+"""
+import threading
+import pandas as pd
+from functions_libraries import get_upcoming_player_props_by_market, get_sharp_book, devig_odds, load_config
+from sports_main import SPORT_CONFIGS, create_market_dataframe, combine_sport_dataframes, dedupe_odds_rows
+from http_client import HttpError
+
+# (sport_key, event_id, market_key) -> (fetched_at, DataFrame of the market's quotes)
+fresh_quotes = {}
+
+# (prop_id, threshold) pairs whose edge disappeared on revalidation; threshold is
+# None when the line itself was pulled or moved
+dead_props = set()
+
+# Held while re-fetching so concurrent accounts never request the same market twice
+fetch_lock = threading.Lock()
+
+def get_quote_age(leg, now):
+    """Seconds since the leg's odds were fetched (infinite if unknown)"""
+    try:
+        fetched_at = pd.Timestamp(leg['fetched_at'])
+    except (KeyError, TypeError, ValueError):
+        return float('inf')
+    if pd.isna(fetched_at):
+        return float('inf')
+    if fetched_at.tzinfo is None:
+        fetched_at = fetched_at.tz_localize('UTC')
+    return (now - fetched_at).total_seconds()
+
+def fetch_market_quotes(sport_key, event_id, market_key):
+    """Re-fetch the standard and alternate variants of one market for one event"""
+    sport_config = next(config for config in SPORT_CONFIGS.values() if config['sport_key'] == sport_key)
+    api_key = load_config()['api_key']
+    frames = []
+    for variant in sport_config['market_keys']:
+        if variant.replace('_alternate', '') != market_key:
+            continue
+        data = get_upcoming_player_props_by_market(sport_key, api_key, event_id, variant)
+        df = create_market_dataframe({event_id: {variant: data}}, variant, sport_key)
+        if not df.empty:
+            frames.append(df)
+    if not frames:
+        return pd.DataFrame()
+    return combine_sport_dataframes(frames)
+
+def get_fresh_quotes(sport_key, event_id, market_key, max_age, now):
+    """Quotes for a market, re-fetched only if the last fetch is older than max_age"""
+    key = (sport_key, event_id, market_key)
+    with fetch_lock:
+        if key in fresh_quotes:
+            fetched_at, quotes = fresh_quotes[key]
+            if (now - fetched_at).total_seconds() <= max_age:
+                return quotes
+        quotes = fetch_market_quotes(sport_key, event_id, market_key)
+        fresh_quotes[key] = (pd.Timestamp.now(tz='UTC'), quotes)
+        return quotes
+
+def revalidate_leg(leg, max_age, threshold, now, dedup_priority='main'):
+    """
+    Refresh a stale leg in place. Returns False if its edge is gone: the line
+    was pulled or moved, or the no-vig probability for its direction is no
+    longer above the threshold.
+    """
+    if (leg['prop_id'], None) in dead_props or (leg['prop_id'], threshold) in dead_props:
+        return False
+    if get_quote_age(leg, now) <= max_age:
+        return True
+
+    book = get_sharp_book(leg['sport'])
+    quotes = get_fresh_quotes(leg['sport'], leg['game_id_odds'], leg['market_key'], max_age, now)
+    if quotes.empty or f'{book}_line' not in quotes.columns:
+        dead_props.add((leg['prop_id'], None))
+        return False
+
+    # Pick between standard and alternate quotes the same way the merge did
+    quotes = dedupe_odds_rows(quotes, book, dedup_priority)
+    match = quotes[(quotes['player_name'] == leg['player_name']) &
+                   (quotes[f'{book}_line'] == leg['bid_stats_value'])]
+    if match.empty:
+        print(f"\t{leg['player_name']} {leg['market_key']} {leg['bid_stats_value']} is no longer offered by {book}")
+        dead_props.add((leg['prop_id'], None))
+        return False
+
+    no_vig_over, no_vig_under = devig_odds(match.iloc[0][f'{book}_over_price'], match.iloc[0][f'{book}_under_price'])
+    probability = no_vig_over if leg['direction'] == 'OVER' else no_vig_under
+    if not probability > threshold:
+        print(f"\tEdge gone for {leg['player_name']} {leg['market_key']} {leg['direction']} "
+              f"{leg['bid_stats_value']}: {probability:.3f}")
+        dead_props.add((leg['prop_id'], threshold))
+        return False
+
+    leg['no_vig_over'] = no_vig_over
+    leg['no_vig_under'] = no_vig_under
+    leg['fetched_at'] = fresh_quotes[(leg['sport'], leg['game_id_odds'], leg['market_key'])][0].isoformat()
+    return True
+
+def revalidate_slip(combo, max_age, threshold, dedup_priority='main'):
+    """True if every leg of the slip still has an edge, refreshing stale legs first"""
+    now = pd.Timestamp.now(tz='UTC')
+    try:
+        return all(revalidate_leg(leg, max_age, threshold, now, dedup_priority) for leg in combo)
+    except HttpError as e:
+        # Could not confirm the edge; skip this slip but do not mark its legs dead
+        print(f"\tCould not revalidate slip: {e}")
+        return False
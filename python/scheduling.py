@@ -0,0 +1,57 @@
+"""
+Lock-time-aware submission scheduling.
+
+Slips are submitted earliest-deadline-first: ordered by the earliest lock time
+among their legs. A slip whose first lock is less than LOCK_MARGIN away when
+its turn comes (checked again after revalidation, which can be slow) is
+skipped instead of failing at submission, and the remaining slack is reported
+per slip.
+"""
+import time
+from functions_libraries import parse_lock_time
+
+# A leg must still be at least this many seconds from locking when its slip is submitted
+LOCK_MARGIN = 30
+
+def get_slip_deadline(combo):
+    """Earliest lock time (epoch seconds) among the slip's legs; inf if none is known"""
+    lock_times = [parse_lock_time(leg.get('lock_time')) for leg in combo]
+    lock_times = [lock_time for lock_time in lock_times if lock_time is not None]
+    return min(lock_times) if lock_times else float('inf')
+
+def drop_locking_plays(plays_df, now=None, lock_margin=LOCK_MARGIN):
+    """Remove plays that lock before any slip containing them could be submitted"""
+    now = time.time() if now is None else now
+    lock_times = plays_df['lock_time'].map(parse_lock_time).astype(float)
+    locking = lock_times.notna() & (lock_times <= now + lock_margin)
+    if locking.any():
+        print(f"Dropping {int(locking.sum())} plays that lock within {lock_margin}s")
+    return plays_df[~locking]
+
+def schedule_slips(all_combinations, now=None):
+    """
+    Order slips of every size earliest-deadline-first.
+    Returns a list of (size, combo, deadline).
+    Nothing is dropped here: most slips are skipped instantly (exposure caps,
+    revalidation, dry runs), so whether a slip can still go out is only known
+    when its turn comes and is checked then against LOCK_MARGIN.
+    """
+    now = time.time() if now is None else now
+    slips = [
+        (get_slip_deadline(combo), size, combo)
+        for size, combos in all_combinations.items()
+        for combo in combos
+    ]
+    # Stable sort keeps the random order among slips with the same deadline
+    slips.sort(key=lambda slip: slip[0])
+
+    deadlines = [deadline for deadline, _, _ in slips if deadline != float('inf')]
+    if deadlines:
+        print(f"Scheduled {len(slips)} slips earliest-lock-first; first lock in "
+              f"{(deadlines[0] - now) / 60:.1f} min, last in {(deadlines[-1] - now) / 60:.1f} min")
+    return [(size, combo, deadline) for deadline, size, combo in slips]
+
+def is_locking(deadline, now=None, lock_margin=LOCK_MARGIN):
+    """True if a slip with this deadline can no longer be submitted safely"""
+    now = time.time() if now is None else now
+    return deadline - now < lock_margin
@@ -1,11 +1,14 @@
+import multiprocessing
+import queue
+from collections import Counter
 import pandas as pd
 from functions_libraries import (
     # Functions
     get_events,
     get_upcoming_player_props_by_market,
     process_yes_no_market,
+    load_config,
     # Variables
-    api_key,
     nba_market_keys,
     ncaam_market_keys,
     nfl_market_keys,
@@ -13,6 +16,10 @@ from functions_libraries import (
     default_col_names,
     nhl_market_keys
 )
+from line_history import record_odds_snapshot
+import stage_cache
+from http_client import HttpError
+from stage_cache import cached_stage, set_cache_enabled
 
 # Sport configurations
 SPORT_CONFIGS = {
@@ -42,6 +49,18 @@ SPORT_CONFIGS = {
     #}
 }
 
+# How duplicate standard/alternate rows are resolved: prefer the main market or the tighter vig
+DEDUP_PRIORITIES = ['main', 'vig']
+
+# Failed Odds API requests of the current run
+fetch_failures = []
+
+# event_id -> ISO time its markets started being fetched in this run
+event_fetch_times = {}
+
+# Cached per-event outputs kept per sport in sharded mode (one per event)
+SHARD_CACHE_ENTRIES = 100
+
 # Add this mapping near SPORT_CONFIGS
 LEAGUE_ID_TO_SPORT = {
     2: 'NFL',
@@ -123,19 +142,40 @@ def create_market_dataframe(market_data, market_key, sport_key):
     #print(f"\tFinished processing market: {market_key}")
     return df
 
-def process_sport(sport_name):
-    """Process all markets for a specific sport"""
-    #print(f"Starting to process {sport_name}...")
-    sport_config = SPORT_CONFIGS[sport_name]
-    sport_key = sport_config['sport_key']
-    market_keys = sport_config['market_keys']
-    
+def record_fetch_failure(sport_name, event_id, market_key, error):
+    """Keep track of a failed Odds API request so the run can report it"""
+    print(f"\tFailed to fetch {sport_name} {market_key or 'events'}"
+          f"{f' for event {event_id}' if event_id else ''}: {error}")
+    fetch_failures.append({
+        'sport': sport_name,
+        'event_id': event_id,
+        'market_key': market_key,
+        'kind': error.kind,
+        'error': str(error)
+    })
+
+def report_fetch_failures():
+    """Print a summary of the failed Odds API requests of this run"""
+    if not fetch_failures:
+        return
+    kinds = Counter(failure['kind'] for failure in fetch_failures)
+    summary = ', '.join(f"{count} {kind}" for kind, count in kinds.most_common())
+    print(f"Warning: {len(fetch_failures)} Odds API requests failed ({summary}); their markets are missing from this run")
+
+def get_upcoming_event_ids(sport_name):
+    """Fetch the events for a sport and return the ids of those starting within 16 hours"""
+    sport_key = SPORT_CONFIGS[sport_name]['sport_key']
+
     # Get events
     print(f"Fetching events for {sport_name}...")
-    events = pd.DataFrame(get_events(sport_key, api_key))
+    try:
+        events = pd.DataFrame(get_events(sport_key, load_config()['api_key']))
+    except HttpError as e:
+        record_fetch_failure(sport_name, None, None, e)
+        return None
     if events.empty:
         print(f"No events found for {sport_name}")
-        return {}
+        return None
     
     #print(f"Found {len(events)} events for {sport_name}")
     events['commence_time'] = pd.to_datetime(events['commence_time']).dt.tz_convert('US/Central')
@@ -150,57 +190,227 @@ def process_sport(sport_name):
         (events['commence_time'] <= time_threshold)
     ]
     print(f"Processing {len(upcoming_events)} upcoming events for {sport_name} within next 16 hours")
+    return upcoming_events['id'].tolist()
+
+def fetch_event_markets(sport_name, event_id):
+    """Fetch every configured market for a single event"""
+    sport_config = SPORT_CONFIGS[sport_name]
+    api_key = load_config()['api_key']
+    print(f"Fetching markets for event ID: {event_id}")
+    event_fetch_times[event_id] = pd.Timestamp.now(tz='UTC').isoformat()
+    event_markets = {}
+    for market_key in sport_config['market_keys']:
+        try:
+            event_markets[market_key] = get_upcoming_player_props_by_market(sport_config['sport_key'], api_key,
+                                                                            event_id, market_key)
+        except HttpError as e:
+            record_fetch_failure(sport_name, event_id, market_key, e)
+            event_markets[market_key] = {}
+    return event_markets
+
+def build_market_dataframes(sport_name, upcoming_player_props_data):
+    """Create one DataFrame per market from the raw per-event props data"""
+    sport_config = SPORT_CONFIGS[sport_name]
+    sport_key = sport_config['sport_key']
+    market_keys = sport_config['market_keys']
+
+    if upcoming_player_props_data:
+        #print(f"Creating DataFrames for {sport_name} markets...")
+        # Create DataFrames for each market
+        return {
+            market_key: create_market_dataframe(upcoming_player_props_data, market_key, sport_key)
+            for market_key in market_keys
+        }
+
+    print(f"No player props data found for {sport_name}, creating empty DataFrames")
+    # Create empty DataFrames if no data
+    return {
+        market_key: pd.DataFrame(columns=default_col_names)
+        for market_key in market_keys
+    }
+
+def process_sport(sport_name):
+    """Process all markets for a specific sport"""
+    #print(f"Starting to process {sport_name}...")
+    event_ids = get_upcoming_event_ids(sport_name)
+    if event_ids is None:
+        return {}
     
     # Create dictionary to store player props data
     upcoming_player_props_data = {}
 
     # Fetch data for each event and market
-    if not upcoming_events.empty:
+    if event_ids:
         # Set to True to process all events, False for first event only
         process_all_events = True
         
-        if process_all_events:
-            event_ids = upcoming_events['id'].tolist()
-            #print(f"Fetching markets for {len(event_ids)} events...")
-            for event_id in event_ids:
-                print(f"Fetching markets for event ID: {event_id}")
-                upcoming_player_props_data[event_id] = {
-                    market_key: get_upcoming_player_props_by_market(sport_key, api_key, event_id, market_key)
-                    for market_key in market_keys
-                }
-        else:
-            first_event_id = upcoming_events['id'].iloc[0]
-            #print(f"Fetching markets for first event ID: {first_event_id}")
-            upcoming_player_props_data[first_event_id] = {
-                market_key: get_upcoming_player_props_by_market(sport_key, api_key, first_event_id, market_key)
-                for market_key in market_keys
-            }
+        if not process_all_events:
+            event_ids = event_ids[:1]
+        #print(f"Fetching markets for {len(event_ids)} events...")
+        for event_id in event_ids:
+            upcoming_player_props_data[event_id] = fetch_event_markets(sport_name, event_id)
     else:
         print(f"No upcoming events found for {sport_name}")
 
-    if upcoming_player_props_data:
-        #print(f"Creating DataFrames for {sport_name} markets...")
-        # Create DataFrames for each market
-        market_dataframes = {
-            market_key: create_market_dataframe(upcoming_player_props_data, market_key, sport_key)
-            for market_key in market_keys
-        }
-    else:
-        print(f"No player props data found for {sport_name}, creating empty DataFrames")
-        # Create empty DataFrames if no data
-        market_dataframes = {
-            market_key: pd.DataFrame(columns=default_col_names)
+    #print(f"Finished processing {sport_name}")
+    return cached_stage(f'odds_frames_{sport_name}', build_market_dataframes,
+                        args=(sport_name, upcoming_player_props_data))
+
+def process_event_shard(sport_name, event_id):
+    """Fetch and build the market DataFrames for a single (sport, event) work unit"""
+    # Separate stage from process_sport so its smaller keep does not prune the per-event entries
+    return cached_stage(f'odds_event_frames_{sport_name}', build_market_dataframes,
+                        args=(sport_name, {event_id: fetch_event_markets(sport_name, event_id)}),
+                        keep=SHARD_CACHE_ENTRIES)
+
+def _shard_worker(task_queue, result_queue, use_cache):
+    """Worker loop: take (sport, event) units off the queue until a None sentinel arrives"""
+    set_cache_enabled(use_cache)
+    for sport_name, event_id in iter(task_queue.get, None):
+        first_failure = len(fetch_failures)
+        try:
+            market_dataframes = process_event_shard(sport_name, event_id)
+            result_queue.put((sport_name, event_id, market_dataframes, fetch_failures[first_failure:],
+                              event_fetch_times.get(event_id), None))
+        except Exception as e:
+            result_queue.put((sport_name, event_id, None, fetch_failures[first_failure:],
+                              event_fetch_times.get(event_id), str(e)))
+
+def process_sports_sharded(sports_to_process, workers):
+    """
+    Split (sport, event) work units across worker processes and merge their results.
+    A worker that fails or dies only loses the shard it was working on.
+    """
+    work_units = []
+    for sport_name in sports_to_process:
+        event_ids = get_upcoming_event_ids(sport_name)
+        if not event_ids:
+            if event_ids is not None:
+                print(f"No upcoming events found for {sport_name}")
+            continue
+        work_units.extend((sport_name, event_id) for event_id in event_ids)
+
+    partial_results = {sport_name: [] for sport_name in sports_to_process}
+    if work_units:
+        workers = min(workers, len(work_units))
+        print(f"Distributing {len(work_units)} events across {workers} workers")
+        task_queue = multiprocessing.Queue()
+        result_queue = multiprocessing.Queue()
+        for unit in work_units:
+            task_queue.put(unit)
+        for _ in range(workers):
+            task_queue.put(None)
+
+        processes = [
+            multiprocessing.Process(target=_shard_worker,
+                                    args=(task_queue, result_queue, stage_cache.cache_enabled), daemon=True)
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+
+        pending = set(work_units)
+        while pending:
+            try:
+                sport_name, event_id, market_dataframes, failures, fetched_at, error = result_queue.get(timeout=1)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    break
+                continue
+            pending.discard((sport_name, event_id))
+            fetch_failures.extend(failures)
+            if fetched_at is not None:
+                event_fetch_times[event_id] = fetched_at
+            if error is not None:
+                print(f"Shard {sport_name}/{event_id} failed: {error}")
+            else:
+                partial_results[sport_name].append(market_dataframes)
+
+        for process in processes:
+            process.join(timeout=1)
+        for sport_name, event_id in sorted(pending):
+            print(f"Shard {sport_name}/{event_id} lost: worker exited before returning a result")
+
+    # Merge the per-event shards back into one DataFrame per market
+    all_sports_data = {}
+    for sport_name, shards in partial_results.items():
+        market_keys = SPORT_CONFIGS[sport_name]['market_keys']
+        all_sports_data[sport_name] = {
+            market_key: pd.concat([shard[market_key] for shard in shards], ignore_index=True)
+            if shards else pd.DataFrame(columns=default_col_names)
             for market_key in market_keys
         }
-    
-    #print(f"Finished processing {sport_name}")
-    return market_dataframes
+    return all_sports_data
 
-def process_all_sports(league_ids=None):
+def combine_sport_dataframes(all_dfs):
+    """Concatenate the market DataFrames and normalize market keys and player names"""
+    combined_df = pd.concat(all_dfs, ignore_index=True)
+    # Remember which rows came from alternate markets so duplicates can be resolved before merging
+    combined_df['is_alternate'] = combined_df['market_key'].str.endswith('_alternate')
+    combined_df['market_key'] = combined_df['market_key'].str.replace('_alternate', '')
+
+    # Replace names from odds api to match drafters
+    name_replacements = {
+        'Christopher Tanev': 'Chris Tanev',
+        'Isaiah Stewart II': 'Isaiah Stewart',
+        'Jonas Valanciunas': 'Jonas Valančiūnas', 
+        'Tim Hardaway Jr': 'Tim Hardaway',
+        'Alperen Sengun': 'Alperen Şengün',
+        'Nicolas Claxton': 'Nic Claxton',
+        'AJ Brown': 'A.J. Brown',
+        'Nikola Jovic': 'Nikola Jović',
+        'Nikola Vucevic': 'Nikola Vučević',
+        'Michael Porter Jr': 'Michael Porter',
+        'Kelly Oubre Jr': 'Kelly Oubre',
+        'Wendell Carter Jr': 'Wendell Carter',
+        'Nikola Jokic': 'Nikola Jokić',
+        'Alexis Lafrenière': 'Alexis Lafreniere',
+        'Gary Trent Jr': 'Gary Trent',
+        'Jaime Jaquez Jr': 'Jaime Jaquez',
+        'Vit Krejci': 'Vít Krejčí',
+        'Bogdan Bogdanovic': 'Bogdan Bogdanović',
+        'Nick Smith Jr': 'Nick Smith',
+        'Trey Murphy III': 'Trey Murphy',
+        'C.J. McCollum': 'CJ McCollum',
+        'Zaon Collins': 'Zaon  Collins',
+        'Kristaps Porzingis': 'Kristaps Porziņģis',
+        'Dennis Schroder': 'Dennis Schröder',
+        'Jaren Jackson Jr': 'Jaren Jackson',
+    }
+    combined_df['player_name'] = combined_df['player_name'].replace(name_replacements)
+    return combined_df
+
+def dedupe_odds_rows(odds_df, book, priority='main'):
+    """
+    Keep one odds row per (player, market, line) for a book, per game.
+    The standard and alternate markets often quote the same line; priority
+    'main' prefers the standard market and 'vig' prefers the lower overround,
+    each using the other as the tie-breaker. Rows without a line for the book are dropped.
+    """
+    if priority not in DEDUP_PRIORITIES:
+        raise ValueError(f"Unknown dedup priority: {priority}. Choose from {', '.join(DEDUP_PRIORITIES)}")
+
+    line_col = f'{book}_line'
+    df = odds_df.dropna(subset=[line_col]).copy()
+    is_alternate = df['is_alternate'].fillna(False).astype(bool) if 'is_alternate' in df.columns else False
+    df['_is_alternate'] = is_alternate
+    df['_vig'] = 1 / df[f'{book}_over_price'] + 1 / df[f'{book}_under_price'] - 1
+
+    sort_cols = ['_is_alternate', '_vig'] if priority == 'main' else ['_vig', '_is_alternate']
+    df = df.sort_values(sort_cols, na_position='last', kind='stable')
+    df = df.drop_duplicates(subset=['player_name', 'market_key', line_col, 'game_id'], keep='first')
+    return df.drop(columns=['_is_alternate', '_vig']).sort_index()
+
+def process_all_sports(league_ids=None, workers=None):
     """
     Process sports data for specified leagues.
     If league_ids is None, process all configured sports.
+    With more than one worker, events are fetched in parallel worker processes.
     """
+    if workers is None:
+        workers = load_config()['shard_workers']
+    fetch_failures.clear()
+    event_fetch_times.clear()
     # Determine which sports to process
     if league_ids is not None:
         sports_to_process = [LEAGUE_ID_TO_SPORT[lid] for lid in league_ids 
@@ -210,11 +420,15 @@ def process_all_sports(league_ids=None):
     
     print(f"Processing sports: {', '.join(sports_to_process)}")
     
-    all_sports_data = {
-        sport_name: process_sport(sport_name)
-        for sport_name in sports_to_process
-    }
+    if workers > 1:
+        all_sports_data = process_sports_sharded(sports_to_process, workers)
+    else:
+        all_sports_data = {
+            sport_name: process_sport(sport_name)
+            for sport_name in sports_to_process
+        }
     print("Finished processing all sports!")
+    report_fetch_failures()
 
     # Combine all dataframes into one
     print("Combining all data into one CSV file...")
@@ -225,42 +439,14 @@ def process_all_sports(league_ids=None):
                 all_dfs.append(df)
 
     if all_dfs:
-        combined_df = pd.concat(all_dfs, ignore_index=True)
-        combined_df['market_key'] = combined_df['market_key'].str.replace('_alternate', '')
-
-        # Replace names from odds api to match drafters
-        name_replacements = {
-            'Christopher Tanev': 'Chris Tanev',
-            'Isaiah Stewart II': 'Isaiah Stewart',
-            'Jonas Valanciunas': 'Jonas Valančiūnas', 
-            'Tim Hardaway Jr': 'Tim Hardaway',
-            'Alperen Sengun': 'Alperen Şengün',
-            'Nicolas Claxton': 'Nic Claxton',
-            'AJ Brown': 'A.J. Brown',
-            'Nikola Jovic': 'Nikola Jović',
-            'Nikola Vucevic': 'Nikola Vučević',
-            'Michael Porter Jr': 'Michael Porter',
-            'Kelly Oubre Jr': 'Kelly Oubre',
-            'Wendell Carter Jr': 'Wendell Carter',
-            'Nikola Jokic': 'Nikola Jokić',
-            'Alexis Lafrenière': 'Alexis Lafreniere',
-            'Gary Trent Jr': 'Gary Trent',
-            'Jaime Jaquez Jr': 'Jaime Jaquez',
-            'Vit Krejci': 'Vít Krejčí',
-            'Bogdan Bogdanovic': 'Bogdan Bogdanović',
-            'Nick Smith Jr': 'Nick Smith',
-            'Trey Murphy III': 'Trey Murphy',
-            'C.J. McCollum': 'CJ McCollum',
-            'Zaon Collins': 'Zaon  Collins',
-            'Kristaps Porzingis': 'Kristaps Porziņģis',
-            'Dennis Schroder': 'Dennis Schröder',
-            'Jaren Jackson Jr': 'Jaren Jackson',
-        }
-        combined_df['player_name'] = combined_df['player_name'].replace(name_replacements)
+        combined_df = cached_stage('odds_combined', combine_sport_dataframes, args=(all_dfs,))
+        # Each event's quotes are at least as fresh as the start of that event's fetch
+        combined_df['fetched_at'] = combined_df['game_id'].map(event_fetch_times)
 
         filename = "data/all_sports_data.csv"
         combined_df.to_csv(filename, index=False)
         print(f"Saved combined data to {filename}")
+        record_odds_snapshot(combined_df)
         return combined_df
     else:
         print("No data to save")
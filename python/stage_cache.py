@@ -0,0 +1,154 @@
+"""
+Content-hashed memoization of pipeline stages.
+
+A stage's output is pickled under data/stage_cache/<stage>/<hash>.pkl, where the
+hash covers CACHE_VERSION, the source of the stage's module and of every
+project module it uses (directly or through other project modules), its
+inputs (DataFrames are hashed by content) and its parameters. When nothing
+upstream changed the stored output is loaded instead of recomputing it.
+"""
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+import tempfile
+from functools import lru_cache
+import pandas as pd
+
+CACHE_DIR = 'data/stage_cache'
+
+# Default number of cached outputs kept per stage
+CACHE_ENTRIES_PER_STAGE = 5
+
+# Bump to invalidate every cached output, e.g. after a change outside the project sources
+CACHE_VERSION = 1
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+cache_enabled = True
+
+def set_cache_enabled(enabled):
+    """Turn stage memoization on or off for the rest of the run"""
+    global cache_enabled
+    cache_enabled = enabled
+
+def reject_non_json(value):
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def update_hash(hasher, value):
+    """Feed a stage input into the hash; DataFrames, containers and JSON-like values are supported"""
+    if isinstance(value, (dict, list, tuple)):
+        # Plain JSON (e.g. raw API responses) is hashed in one pass
+        try:
+            hasher.update(json.dumps(value, sort_keys=True, default=reject_non_json).encode())
+            return
+        except TypeError:
+            pass
+
+    if isinstance(value, pd.DataFrame):
+        hasher.update(b'DataFrame')
+        hasher.update(json.dumps([str(col) for col in value.columns]).encode())
+        hasher.update(json.dumps([str(dtype) for dtype in value.dtypes]).encode())
+        hasher.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, dict):
+        hasher.update(b'dict')
+        for key in sorted(value, key=str):
+            update_hash(hasher, key)
+            update_hash(hasher, value[key])
+    elif isinstance(value, (list, tuple)):
+        hasher.update(f'list{len(value)}'.encode())
+        for item in value:
+            update_hash(hasher, item)
+    else:
+        hasher.update(json.dumps(value, sort_keys=True, default=str).encode())
+
+def get_project_module(value):
+    """The project module a global refers to (a module, function or class defined here), else None"""
+    module = value if inspect.ismodule(value) else sys.modules.get(getattr(value, '__module__', None) or '')
+    path = getattr(module, '__file__', None)
+    if path and os.path.isfile(path) and os.path.dirname(os.path.abspath(path)) == PROJECT_DIR:
+        return module
+    return None
+
+@lru_cache(maxsize=None)
+def get_source_hash(module_name):
+    """Hash of the source of a module and every project module it references, transitively"""
+    seen = set()
+    pending = [sys.modules[module_name]]
+    while pending:
+        module = pending.pop()
+        if module.__name__ in seen:
+            continue
+        seen.add(module.__name__)
+        for value in list(vars(module).values()):
+            dependency = get_project_module(value)
+            if dependency is not None and dependency.__name__ not in seen:
+                pending.append(dependency)
+
+    hasher = hashlib.sha256()
+    for name in sorted(seen):
+        hasher.update(name.encode())
+        with open(sys.modules[name].__file__, 'rb') as f:
+            hasher.update(f.read())
+    return hasher.hexdigest()
+
+def get_stage_key(func, args, params):
+    """Hash of the stage code (and the code it depends on), inputs and parameters"""
+    hasher = hashlib.sha256()
+    hasher.update(f'v{CACHE_VERSION}'.encode())
+    hasher.update(func.__qualname__.encode())
+    hasher.update(get_source_hash(func.__module__).encode())
+    update_hash(hasher, list(args))
+    update_hash(hasher, params)
+    return hasher.hexdigest()
+
+def prune_stage(stage_dir, keep):
+    """Drop all but the most recently used outputs of a stage"""
+    entries = []
+    for name in os.listdir(stage_dir):
+        if name.endswith('.pkl'):
+            path = os.path.join(stage_dir, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                # Pruned by another worker in the meantime
+                pass
+    for _, path in sorted(entries, reverse=True)[keep:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def cached_stage(name, func, args=(), params=None, keep=CACHE_ENTRIES_PER_STAGE):
+    """
+    Return func(*args, **params), reusing the stored output when the inputs
+    and parameters are unchanged. keep is the number of outputs retained for the stage.
+    """
+    params = params or {}
+    if not cache_enabled:
+        return func(*args, **params)
+
+    stage_dir = os.path.join(CACHE_DIR, name)
+    path = os.path.join(stage_dir, f"{get_stage_key(func, args, params)}.pkl")
+    if os.path.exists(path):
+        try:
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+            os.utime(path)
+            print(f"Stage {name} unchanged, reusing cached output")
+            return result
+        except Exception as e:
+            print(f"Warning: could not load cached output for stage {name}: {e}")
+
+    result = func(*args, **params)
+
+    # Write to a temporary file first so concurrent workers never read a partial pickle
+    os.makedirs(stage_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=stage_dir, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    prune_stage(stage_dir, keep)
+    return result
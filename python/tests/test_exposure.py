@@ -0,0 +1,49 @@
+import json
+from datetime import date, timedelta
+from exposure import ExposureTracker, parse_limit
+
+def make_leg(player, game, prop):
+    return {'player_id': player, 'game_id_odds': game, 'prop_id': prop}
+
+def test_parse_limit():
+    assert parse_limit('5') == 5
+    assert parse_limit('0.25') == 0.25
+    assert parse_limit('') is None
+    assert parse_limit(None) is None
+
+def test_absolute_player_cap(tmp_path):
+    tracker = ExposureTracker({'player': 2}, path=str(tmp_path / 'counts.json'))
+    slip = [make_leg(1, 'g1', 'p1'), make_leg(2, 'g2', 'p2')]
+    for _ in range(2):
+        assert tracker.allows(slip)
+        tracker.record(slip)
+    assert not tracker.allows(slip)
+    assert tracker.allows([make_leg(3, 'g3', 'p3')])
+
+def test_fractional_cap_uses_minimum_denominator(tmp_path):
+    tracker = ExposureTracker({'game': 0.2}, path=str(tmp_path / 'counts.json'))
+    slip = [make_leg(1, 'g1', 'p1')]
+    # 20% of at least 10 slips: a game may appear in 2 slips before more are submitted
+    for _ in range(2):
+        assert tracker.allows(slip)
+        tracker.record(slip)
+    assert not tracker.allows(slip)
+
+def test_counts_persist_and_reset_daily(tmp_path):
+    path = str(tmp_path / 'counts.json')
+    slip = [make_leg(1, 'g1', 'p1')]
+    tracker = ExposureTracker({'prop': 1}, path=path)
+    tracker.record(slip)
+    assert not ExposureTracker({'prop': 1}, path=path).allows(slip)
+
+    with open(path) as f:
+        counts = json.load(f)
+    counts['date'] = (date.today() - timedelta(days=1)).isoformat()
+    with open(path, 'w') as f:
+        json.dump(counts, f)
+    assert ExposureTracker({'prop': 1}, path=path).allows(slip)
+
+def test_dry_run_tracker_does_not_persist(tmp_path):
+    path = tmp_path / 'counts.json'
+    ExposureTracker({'prop': 1}, path=str(path), persist=False).record([make_leg(1, 'g1', 'p1')])
+    assert not path.exists()
@@ -0,0 +1,100 @@
+import pytest
+import requests
+import http_client
+
+URL = 'https://api.example.test/v4/sports?apiKey=secret'
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.text = ''
+        self.headers = {}
+
+@pytest.fixture(autouse=True)
+def breaker(monkeypatch):
+    """Fresh breaker state and a controllable clock for every test"""
+    clock = [1000.0]
+    monkeypatch.setattr(http_client, 'circuit_breakers', {})
+    monkeypatch.setattr(http_client.time, 'monotonic', lambda: clock[0])
+    return clock
+
+def respond_with(monkeypatch, *outcomes):
+    """Make requests.request return/raise the given outcomes in order, counting calls"""
+    calls = []
+
+    def fake_request(method, url, **kwargs):
+        outcome = outcomes[min(len(calls), len(outcomes) - 1)]
+        calls.append(url)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(outcome)
+
+    monkeypatch.setattr(http_client.requests, 'request', fake_request)
+    return calls
+
+def get_state():
+    return http_client.circuit_breakers[http_client.get_host(URL)]
+
+def open_circuit(monkeypatch):
+    respond_with(monkeypatch, requests.exceptions.ConnectionError('down'))
+    for _ in range(http_client.BREAKER_FAILURE_THRESHOLD):
+        with pytest.raises(http_client.HttpError):
+            http_client.request('GET', URL, retries=0)
+    assert get_state()['opened_at'] is not None
+
+def test_circuit_opens_and_fails_fast(monkeypatch):
+    open_circuit(monkeypatch)
+    calls = respond_with(monkeypatch, 200)
+    with pytest.raises(http_client.CircuitOpenError):
+        http_client.request('GET', URL, retries=0)
+    assert calls == []
+
+def test_half_open_trial_success_closes_circuit(monkeypatch, breaker):
+    open_circuit(monkeypatch)
+    breaker[0] += http_client.BREAKER_COOLDOWN
+    respond_with(monkeypatch, 200)
+    assert http_client.request('GET', URL, retries=0).ok
+    assert get_state() == {'failures': 0, 'opened_at': None, 'trial': False}
+
+def test_half_open_trial_failure_reopens_circuit(monkeypatch, breaker):
+    open_circuit(monkeypatch)
+    breaker[0] += http_client.BREAKER_COOLDOWN
+    respond_with(monkeypatch, 503)
+    with pytest.raises(http_client.HttpError) as error:
+        http_client.request('GET', URL, retries=0)
+    assert error.value.kind == 'server_error'
+    assert get_state()['trial'] is False
+    assert get_state()['opened_at'] == breaker[0]
+    with pytest.raises(http_client.CircuitOpenError):
+        http_client.request('GET', URL, retries=0)
+
+def test_only_one_trial_while_half_open(monkeypatch, breaker):
+    open_circuit(monkeypatch)
+    breaker[0] += http_client.BREAKER_COOLDOWN
+    http_client.check_circuit(URL)
+    with pytest.raises(http_client.CircuitOpenError):
+        http_client.check_circuit(URL)
+
+def test_unclassified_request_error_releases_trial(monkeypatch, breaker):
+    open_circuit(monkeypatch)
+    breaker[0] += http_client.BREAKER_COOLDOWN
+    respond_with(monkeypatch, requests.exceptions.ChunkedEncodingError('broken body'))
+    with pytest.raises(http_client.HttpError) as error:
+        http_client.request('GET', URL, retries=0)
+    assert error.value.kind == 'request'
+    assert get_state()['trial'] is False
+
+def test_invalid_request_is_not_retried_or_counted(monkeypatch):
+    calls = respond_with(monkeypatch, requests.exceptions.InvalidHeader('bad header'))
+    with pytest.raises(http_client.HttpError) as error:
+        http_client.request('GET', URL, retries=3)
+    assert error.value.kind == 'invalid_request'
+    assert len(calls) == 1
+    assert get_state()['failures'] == 0
+
+def test_error_messages_hide_api_key(monkeypatch):
+    respond_with(monkeypatch, requests.exceptions.ConnectionError(f'failed for {URL}'))
+    with pytest.raises(http_client.HttpError) as error:
+        http_client.request('GET', URL, retries=0)
+    assert 'secret' not in str(error.value)
@@ -0,0 +1,80 @@
+import os
+import numpy as np
+import pandas as pd
+import line_history
+
+def make_snapshot(over_price=1.9):
+    return pd.DataFrame({
+        'player_name': ['A', 'B'],
+        'market_key': ['player_points', 'player_rebounds'],
+        'book': ['pinnacle', 'pinnacle'],
+        'line': [20.5, 5.5],
+        'over_price': [over_price, 1.8],
+        'under_price': [1.9, 2.0]
+    })
+
+def column_lengths(store_dir):
+    return {
+        name: os.path.getsize(os.path.join(store_dir, f'{name}.bin')) // np.dtype(dtype).itemsize
+        for name, dtype in line_history.COLUMN_DTYPES.items()
+    }
+
+def test_append_realigns_columns_after_partial_write(tmp_path):
+    store_dir = str(tmp_path / 'odds')
+    line_history.append_snapshot(store_dir, make_snapshot(), timestamp=1)
+    # Simulate a crash after only some columns of the next append were written
+    with open(os.path.join(store_dir, 'line.bin'), 'ab') as f:
+        f.write(np.zeros(2, dtype=np.float64).tobytes())
+
+    line_history.append_snapshot(store_dir, make_snapshot(), timestamp=2)
+    assert set(column_lengths(store_dir).values()) == {4}
+    columns = line_history.load_columns(store_dir)
+    assert list(columns['line']) == [20.5, 5.5, 20.5, 5.5]
+
+def test_timestamps_stay_sorted(tmp_path):
+    store_dir = str(tmp_path / 'odds')
+    line_history.append_snapshot(store_dir, make_snapshot(), timestamp=10)
+    line_history.append_snapshot(store_dir, make_snapshot(), timestamp=5)
+    assert list(line_history.load_columns(store_dir)['timestamp']) == [10, 10, 10, 10]
+
+def test_odds_snapshot_separates_alternate_markets():
+    odds_df = pd.DataFrame({
+        'player_name': ['A', 'A', 'A'],
+        'market_key': ['player_points'] * 3,
+        'is_alternate': [False, True, False],
+        'pinnacle_line': [20.5, 20.5, 20.5],
+        'pinnacle_over_price': [1.9, 2.0, 1.9],
+        'pinnacle_under_price': [1.9, 1.8, 1.9]
+    })
+    snapshot = line_history.odds_to_snapshot(odds_df)
+    assert sorted(snapshot['market_key']) == ['player_points', 'player_points_alternate']
+
+def record(monkeypatch, tmp_path, snapshot):
+    monkeypatch.setattr(line_history, 'HISTORY_DIR', str(tmp_path))
+    line_history.append_snapshot(line_history.get_store_dir('odds'), snapshot)
+
+def test_price_moves_compare_each_key_with_its_own_previous_quote(monkeypatch, tmp_path):
+    nba, nhl = make_snapshot().iloc[[0]], make_snapshot().iloc[[1]]
+    record(monkeypatch, tmp_path, nba)
+    record(monkeypatch, tmp_path, nhl)
+    moved_nba = nba.copy()
+    moved_nba['over_price'] = 2.0
+    record(monkeypatch, tmp_path, moved_nba)
+    record(monkeypatch, tmp_path, nhl)
+
+    moves = line_history.get_price_moves(5)
+    assert list(moves['player_name']) == ['A']
+    assert moves['over_move_cents'].round(6).tolist() == [10.0]
+
+def test_identical_snapshots_have_no_moves(monkeypatch, tmp_path):
+    record(monkeypatch, tmp_path, make_snapshot())
+    record(monkeypatch, tmp_path, make_snapshot())
+    assert line_history.get_price_moves(0).empty
+
+def test_price_moves_across_appends_with_the_same_timestamp(monkeypatch, tmp_path):
+    monkeypatch.setattr(line_history, 'HISTORY_DIR', str(tmp_path))
+    store_dir = line_history.get_store_dir('odds')
+    now = pd.Timestamp.now(tz='UTC').value
+    line_history.append_snapshot(store_dir, make_snapshot(1.9), timestamp=now)
+    line_history.append_snapshot(store_dir, make_snapshot(2.0), timestamp=now)
+    assert list(line_history.get_price_moves(5)['player_name']) == ['A']